@@ -1,18 +1,33 @@
-from binance.client import Client
-import pandas as pd
+import asyncio
+import aiohttp
+import io
+import zipfile
+import numpy as np
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
 import os
-from ConfigBinance.Config import Config
 from datetime import datetime, timezone
 from dateutil.relativedelta import relativedelta
 from tqdm import tqdm
+from tqdm.asyncio import tqdm as tqdm_asyncio
 
-# Initialize Binance client
-client = Client(Config.BINANCE_API_KEY, Config.BINANCE_API_SECRET)
+# Binance public REST endpoint (klines need no API key)
+BASE_URL = "https://api.binance.com/api/v3/klines"
+KLINE_LIMIT = 1000            # Max klines Binance returns per request
+# Prebuilt monthly kline archives on Binance's public data CDN (not rate limited like the API)
+ARCHIVE_URL = (
+    "https://data.binance.vision/data/spot/monthly/klines/"
+    "{coin}/{interval}/{coin}-{interval}-{year}-{month:02d}.zip"
+)
 
 # User settings
 coin_type = "XRPUSDT"  # Trading pair
 history_years = 5      # Number of years to go back
-interval = Client.KLINE_INTERVAL_1MINUTE  # Time interval
+interval = "1m"        # Time interval (same as Client.KLINE_INTERVAL_1MINUTE)
+max_concurrent_requests = 8   # Requests in flight at once
+max_requests_per_minute = 1100  # Stay under Binance's 1200 req/min limit
+max_concurrent_archives = 16    # Monthly ZIP downloads in flight at once
 
 # Define date range
 end_date = datetime.now(timezone.utc)
@@ -23,73 +38,178 @@ folder_name = f"downloaded_coin_data/{coin_type}_{interval}"
 if not os.path.exists(folder_name):
     os.makedirs(folder_name)
 
-# Build list of monthly date ranges
+# Build list of calendar-month date ranges (so whole months match Binance's archives)
 month_periods = []
-current_date = start_date
+current_date = start_date.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
 while current_date < end_date:
     next_date = current_date + relativedelta(months=1)
     period_end = min(next_date, end_date)
     month_periods.append((current_date, period_end))
     current_date = next_date
 
-# Loop over each month with a progress bar
-for period_start, period_end in tqdm(month_periods, desc="Downloading monthly data"):
-    # File name in format "YYYY_MM.csv"
-    file_name = f"{period_start.year}_{period_start.month:02d}.csv"
-    file_path = os.path.join(folder_name, file_name)
-    
-    # Skip if file already exists
-    if os.path.exists(file_path):
-        tqdm.write(f"File {file_name} already exists, skipping...")
-        continue
-
-    # Format dates for the API (e.g., "01 Jan, 2020")
-    start_str = period_start.strftime("%d %b, %Y")
-    end_str = period_end.strftime("%d %b, %Y")
-
-    tqdm.write(f"Fetching data from {start_str} to {end_str}...")
-    klines = client.get_historical_klines(coin_type, interval, start_str, end_str)
-
-    if not klines:
-        tqdm.write(f"No data returned for {start_str} to {end_str}")
-        continue
-
-    # Define expected columns (from Binance)
-    columns = [
-        'Open time', 'Open', 'High', 'Low', 'Close', 'Volume',
-        'Close time', 'Quote asset volume', 'Number of trades',
-        'Taker buy base asset volume', 'Taker buy quote asset volume', 'Ignore'
-    ]
-    df = pd.DataFrame(klines, columns=columns)
-
-    # Convert numeric columns
-    numeric_cols = ['Open', 'High', 'Low', 'Close', 'Volume',
-                    'Quote asset volume', 'Taker buy base asset volume', 'Taker buy quote asset volume']
-    df[numeric_cols] = df[numeric_cols].apply(pd.to_numeric, errors='coerce')
-
-    # Convert timestamp columns from milliseconds to datetime objects
-    df['Open time'] = pd.to_datetime(df['Open time'], unit='ms')
-    df['Close time'] = pd.to_datetime(df['Close time'], unit='ms')
-
-    # Format the DataFrame for Backtrader:
-    # 1. Keep only necessary columns.
-    # 2. Rename to lowercase names that Backtrader expects.
-    # 3. Add 'openinterest' (Backtrader uses this optionally).
-    # 4. Set the datetime column as the index.
-    df = df[['Open time', 'Open', 'High', 'Low', 'Close', 'Volume']].copy()
-    df.rename(columns={
-        'Open time': 'datetime',
-        'Open': 'open',
-        'High': 'high',
-        'Low': 'low',
-        'Close': 'close',
-        'Volume': 'volume'
-    }, inplace=True)
-    df['openinterest'] = 0  # Add openinterest column
-
-    # Set the datetime column as the index (Backtrader requires the index to be datetime)
-    df.set_index('datetime', inplace=True)
-
-    # Save the DataFrame as CSV
-    df.to_csv(file_path)
+
+class RateLimiter:
+    """Spaces requests out evenly so we never exceed `max_requests` per `period` seconds."""
+
+    def __init__(self, max_requests, period=60.0):
+        self.interval = period / max_requests
+        self._next_slot = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        async with self._lock:
+            now = asyncio.get_running_loop().time()
+            delay = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+async def fetch_klines(session, semaphore, limiter, start_ms, end_ms):
+    """Fetch all klines in [start_ms, end_ms), paginating KLINE_LIMIT at a time."""
+    klines = []
+    while start_ms < end_ms:
+        params = {
+            'symbol': coin_type,
+            'interval': interval,
+            'startTime': start_ms,
+            'endTime': end_ms - 1,
+            'limit': KLINE_LIMIT,
+        }
+        async with semaphore:
+            await limiter.wait()
+            async with session.get(BASE_URL, params=params) as response:
+                response.raise_for_status()
+                batch = await response.json()
+
+        if not batch:
+            break
+        klines.extend(batch)
+        # Continue after the last open time we received
+        start_ms = batch[-1][0] + 1
+    return klines
+
+
+def klines_to_table(klines):
+    """
+    Build the Backtrader-ready table (ts_ms, open, high, low, close, volume,
+    openinterest) straight from the raw kline lists Binance returns.
+    The open time is kept as raw epoch milliseconds (int64) so readers can
+    build the datetime index on pandas' fast integer path.
+    Binance sends prices/volumes as decimal strings, so the whole OHLCV block
+    is converted to float64 in one astype instead of column by column. The block
+    is column-major, so Arrow wraps each column without copying it again.
+    """
+    rows = np.asarray(klines, dtype=object)
+    ohlcv = rows[:, 1:6].astype(np.float64, order='F')  # Open, High, Low, Close, Volume
+
+    return pa.Table.from_arrays(
+        [
+            pa.array(rows[:, 0].astype(np.int64)),  # Open time (epoch ms)
+            *(pa.array(ohlcv[:, i]) for i in range(5)),
+            pa.array(np.zeros(len(rows), dtype=np.int64)),  # openinterest
+        ],
+        names=['ts_ms', 'open', 'high', 'low', 'close', 'volume', 'openinterest'],
+    )
+
+
+async def fetch_monthly_archive(session, semaphore, period_start):
+    """
+    Download Binance's monthly kline ZIP and return the CSV inside it, or None
+    if that month has not been published yet (e.g. the current month).
+    """
+    url = ARCHIVE_URL.format(
+        coin=coin_type, interval=interval, year=period_start.year, month=period_start.month
+    )
+    async with semaphore:
+        async with session.get(url) as response:
+            if response.status == 404:
+                return None
+            response.raise_for_status()
+            payload = await response.read()
+
+    with zipfile.ZipFile(io.BytesIO(payload)) as archive:
+        return archive.read(archive.namelist()[0])
+
+
+def archive_to_table(csv_bytes):
+    """
+    Same table as `klines_to_table`, parsed from an archive CSV by Arrow's
+    multithreaded reader (only the first six columns are converted).
+    """
+    read_options = pacsv.ReadOptions(
+        autogenerate_column_names=True,
+        skip_rows=0 if csv_bytes[:1].isdigit() else 1,  # some archives have a header row
+    )
+    names = ['f0', 'f1', 'f2', 'f3', 'f4', 'f5']
+    convert_options = pacsv.ConvertOptions(
+        include_columns=names,
+        column_types={'f0': pa.int64(), **{name: pa.float64() for name in names[1:]}},
+    )
+    raw = pacsv.read_csv(io.BytesIO(csv_bytes), read_options=read_options, convert_options=convert_options)
+
+    ts = raw.column('f0').to_numpy()
+    # Archives from 2025 onwards stamp open times in microseconds
+    if len(ts) and ts[0] > 10**14:
+        ts = ts // 1000
+
+    return pa.Table.from_arrays(
+        [
+            pa.array(ts),
+            *(raw.column(name) for name in names[1:]),
+            pa.array(np.zeros(len(ts), dtype=np.int64)),  # openinterest
+        ],
+        names=['ts_ms', 'open', 'high', 'low', 'close', 'volume', 'openinterest'],
+    )
+
+
+async def download_month(session, semaphore, archive_semaphore, limiter, period_start, period_end):
+    # Hive-style partition folder "year=YYYY/month=MM" so the months read back as one dataset
+    month_name = f"{period_start.year}_{period_start.month:02d}"
+    partition_dir = os.path.join(folder_name, f"year={period_start.year}", f"month={period_start.month:02d}")
+    file_path = os.path.join(partition_dir, "part.parquet")
+
+    # Skip if the month already exists (older downloads were flat YYYY_MM.parquet/.csv files)
+    if any(os.path.exists(path) for path in (
+        file_path,
+        os.path.join(folder_name, f"{month_name}.parquet"),
+        os.path.join(folder_name, f"{month_name}.csv"),
+    )):
+        tqdm.write(f"File {month_name} already exists, skipping...")
+        return
+
+    # Whole past months come from one archive download; fall back to paging
+    # through the REST API for months that aren't archived yet
+    csv_bytes = await fetch_monthly_archive(session, archive_semaphore, period_start)
+    if csv_bytes is not None:
+        table = await asyncio.to_thread(archive_to_table, csv_bytes)
+    else:
+        start_ms = int(period_start.timestamp() * 1000)
+        end_ms = int(period_end.timestamp() * 1000)
+        klines = await fetch_klines(session, semaphore, limiter, start_ms, end_ms)
+
+        if not klines:
+            tqdm.write(f"No data returned for {period_start:%d %b, %Y} to {period_end:%d %b, %Y}")
+            return
+
+        table = klines_to_table(klines)
+
+    # Save as zstd-compressed Parquet (in a worker thread so other downloads keep going)
+    os.makedirs(partition_dir, exist_ok=True)
+    await asyncio.to_thread(pq.write_table, table, file_path, compression='zstd')
     tqdm.write(f"Saved data to {file_path}")
+
+
+async def download_all():
+    semaphore = asyncio.Semaphore(max_concurrent_requests)
+    archive_semaphore = asyncio.Semaphore(max_concurrent_archives)
+    limiter = RateLimiter(max_requests_per_minute)
+    async with aiohttp.ClientSession() as session:
+        tasks = [
+            download_month(session, semaphore, archive_semaphore, limiter, period_start, period_end)
+            for period_start, period_end in month_periods
+        ]
+        await tqdm_asyncio.gather(*tasks, desc="Downloading monthly data")
+
+
+asyncio.run(download_all())
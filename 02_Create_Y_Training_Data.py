@@ -1,65 +1,39 @@
 #!/usr/bin/env python3
-import backtrader as bt
-import pandas as pd
-from datetime import datetime
-from tqdm import tqdm  # <-- For progress bar
+import os
+import numpy as np
+import polars as pl
+from lib.scenario_XRPUSDT import load_price_data
 
-class SMARecordingStrategy(bt.Strategy):
-    params = dict(
-        sma_period=14,
-        output_csv="training_data/sma_data.csv"
-    )
-
-    def start(self):
-        """Called once at the beginning of the backtest."""
-        # We'll set up a tqdm progress bar using the total number of bars
-        self.total_bars = len(self.data)
-        self.bar_counter = 0
-        self.pbar = tqdm(total=self.total_bars, desc="Processing bars")
-
-    def __init__(self):
-        self.sma = bt.indicators.SimpleMovingAverage(self.data.close, period=self.p.sma_period)
-        self.output = []
-
-    def next(self):
-        dt = self.data.datetime.datetime(0)
-        self.output.append({
-            'datetime': dt.strftime('%Y-%m-%d %H:%M:%S'),
-            'close': self.data.close[0],
-            'sma_current': self.sma[0],
-        })
-
-        # Update the progress bar
-        self.bar_counter += 1
-        self.pbar.update(1)
-
-    def stop(self):
-        # Close the progress bar
-        self.pbar.close()
-
-        # Convert recorded data to a DataFrame and save
-        df = pd.DataFrame(self.output)
-        df.to_csv(self.p.output_csv, index=False)
-        print(f"SMA data saved to {self.p.output_csv}")
+# The label is how far the 100-bar SMA moves over the next 5 bars, in percent.
+sma_period = 100
+lookahead_bars = 5
 
 if __name__ == "__main__":
 
-    from lib.scenario_XRPUSDT import create_cerebro_with_warmup
-
-    # 1) Run the backtest to record the current SMA
-
-    cerebro = create_cerebro_with_warmup()
-
-    cerebro.addstrategy(SMARecordingStrategy, sma_period=100)
-
-    cerebro.run()
-
-    # 2) Now shift the column for future SMA
-    
-    lookahead_bars = 5
-
-    df = pd.read_csv("training_data/sma_data.csv", parse_dates=['datetime'])
-    df['sma_future'] = df['sma_current'].shift(-lookahead_bars)
-    df['sma_diff_percent'] = ((df['sma_future'] - df['sma_current']) / df['sma_current']) * 100
-    df.to_csv("training_data/y_data.csv", index=False)
-    print("Updated CSV with future SMA saved as training_data/y_data.csv")
+    # 1) Load the same price history the Backtrader scenario uses
+    data = load_price_data()
+
+    # 2) Current SMA, then the SMA `lookahead_bars` later via one slice copy
+    close = data['close'].to_numpy(dtype=np.float64)
+    sma_current = pl.Series(close).rolling_mean(sma_period).to_numpy()
+    sma_future = np.empty_like(sma_current)
+    sma_future[:-lookahead_bars] = sma_current[lookahead_bars:]
+    sma_future[-lookahead_bars:] = np.nan
+
+    df = pl.DataFrame({
+        'ts_ms': data.index.values.astype('datetime64[ms]').astype(np.int64),
+        'close': close,
+        'sma_current': sma_current,
+        'sma_future': sma_future,
+        'sma_diff_percent': (sma_future - sma_current) / sma_current * 100,
+    })
+
+    # Only keep rows once the SMA has warmed up (as the Backtrader version did)
+    df = df.slice(sma_period - 1)
+
+    output_folder = "training_data"
+    if not os.path.exists(output_folder):
+        os.makedirs(output_folder)
+    output_file = os.path.join(output_folder, "y_data.parquet")
+    df.write_parquet(output_file)
+    print(f"Y training data saved to {output_file}")
@@ -1,75 +1,85 @@
-import pandas as pd
+import os
+import polars as pl
+import polars.selectors as cs
 import numpy as np
 from sklearn.model_selection import train_test_split
 import tensorflow as tf
+from tensorflow.keras import mixed_precision
 import matplotlib.pyplot as plt
+from lib.features import valid_rows
+
+# Mixed precision only pays off on GPU tensor cores (it is slower on CPU)
+if tf.config.list_physical_devices('GPU'):
+    mixed_precision.set_global_policy('mixed_float16')
 
 # -------------------------
-# 1. Load X and Y CSV
+# 1. Load X and Y Parquet
 # -------------------------
-x_data = pd.read_csv("training_data/x_data.csv")
-y_data = pd.read_csv("training_data/y_data.csv") 
-#   ^-- Contains columns: ['datetime', 'close', 'sell_signal', 'buy_signal'] (for example)
-
-# Merge on 'datetime' so X and Y line up
-merged_data = pd.merge(x_data, y_data, on='datetime', how='inner')
+# Polars joins lazily on its multithreaded engine and only materialises the result.
+# Both files are written in time order, so flag 'ts_ms' as sorted (like joining on a
+# sorted index) to let Polars skip hashing the keys.
+merged_data = (
+    pl.scan_parquet("training_data/x_data/*.parquet").set_sorted('ts_ms')
+    .join(pl.scan_parquet("training_data/y_data.parquet").set_sorted('ts_ms'), on='ts_ms', how='inner')
+    .collect(engine='streaming')
+)
+#   ^-- Y side contributes: ['close', 'sma_current', 'sma_future', 'sma_diff_percent']
+#       (its 'close' clashes with X's, so Polars names it 'close_right')
 
 # -------------------------
 # 2. Define which columns are Y (targets)
-#    We now have two signals: sell_signal and buy_signal
 # -------------------------
-# Merge on 'datetime'
-merged_data = pd.merge(x_data, y_data, on='datetime', how='inner')
-
-# For example, if you only want the 'close' from the X side:
-if 'close_y' in merged_data.columns:
-    merged_data.drop('close_y', axis=1, inplace=True)
+# We only want the 'close' from the X side
+if 'close_right' in merged_data.columns:
+    merged_data = merged_data.drop('close_right')
 
 # Define which columns are your targets
 y_columns = ['sma_diff_percent']  # for example
 
-# Create X by dropping 'datetime' and the y_columns
-X = merged_data.drop(columns=y_columns + ['datetime', 'sma_current', 'sma_future'], errors='ignore')
-
-X.head()
-
-y = merged_data[y_columns]
+y = merged_data.select(y_columns)
 
 # 1) Print all columns in merged_data:
-print("All merged_data columns:", merged_data.columns.tolist())
+print("All merged_data columns:", merged_data.columns)
 
 # 2) Drop the columns you *intend* to remove and check what's left:
-temp_X = merged_data.drop(columns=y_columns + ['datetime', 'sma_current', 'sma_future'], errors='ignore')
-print("Columns after drop:", temp_X.columns.tolist())
+temp_X = merged_data.drop(y_columns + ['ts_ms', 'sma_current', 'sma_future'], strict=False)
+print("Columns after drop:", temp_X.columns)
 
-# 3) Check the dtypes (sometimes 'datetime' might have become numeric or object):
-print("Dtypes in temp_X:\n", temp_X.dtypes)
+# 3) Check the dtypes ('ts_ms' is numeric, so it must not slip through into X):
+print("Dtypes in temp_X:\n", temp_X.schema)
 
 # 4) Print shape before numeric-only filtering:
 print("Shape before numeric filtering:", temp_X.shape)
 
 # 5) Now pick only numeric columns:
-temp_X_numeric = temp_X.select_dtypes(include=[np.number])
-print("Columns kept as numeric:", temp_X_numeric.columns.tolist())
+temp_X_numeric = temp_X.select(cs.numeric())
+print("Columns kept as numeric:", temp_X_numeric.columns)
 print("Shape of numeric-only temp_X:", temp_X_numeric.shape)
 
-# 6) If everything looks correct, assign back to X:
-X = temp_X_numeric.values.astype(np.float32)
+# 6) If everything looks correct, write X once into a float32 memmap (column by
+#    column, so no float64 copy of the whole matrix is made) and drop the frames;
+#    training reads it batch by batch, so only the batches in flight are in RAM.
+X_path = "training_data/train_x.f32"
+n_rows, n_cols = temp_X_numeric.shape
+X = np.memmap(X_path, dtype=np.float32, mode='w+', shape=(n_rows, n_cols))
+for j, column in enumerate(temp_X_numeric.columns):
+    X[:, j] = temp_X_numeric[column].to_numpy()
+X.flush()
+
+# Convert to float32 (nulls come through as NaN)
+y = y.to_numpy().astype(np.float32)
 
-# Convert to float32
-# X = X.select_dtypes(include=[np.number]).values.astype(np.float32)
-y = y.select_dtypes(include=[np.number]).values.astype(np.float32)
+del merged_data, temp_X, temp_X_numeric
 
-# Drop rows where X or y has NaN
-valid_mask = (~np.isnan(X).any(axis=1)) & (~np.isnan(y).any(axis=1))
-X = X[valid_mask]
-y = y[valid_mask]
+# Keep only rows where X and y have no NaN
+valid_idx = np.flatnonzero(valid_rows(X, y))
 
 # -------------------------
 # 3. Train/Test Split
 # -------------------------
-X_train, X_test, y_train, y_test = train_test_split(
-    X, y,
+# Split row indices rather than the data; the rows are read from the memmap per batch
+idx_train, idx_test = train_test_split(
+    valid_idx,
     test_size=0.2,
     random_state=42
 )
@@ -79,27 +89,29 @@ X_train, X_test, y_train, y_test = train_test_split(
 #    2 outputs = [sell_signal, buy_signal]
 #    Use sigmoid activation + binary crossentropy for binary classification
 # -------------------------
-input_dim = X_train.shape[1]   # Number of features
+input_dim = X.shape[1]   # Number of features
 
 print(f"Input Dimension: {input_dim}")
 
-output_dim = y_train.shape[1]  # Should be 2 (sell, buy)
+output_dim = y.shape[1]  # Should be 2 (sell, buy)
 
 model = tf.keras.Sequential([
     tf.keras.layers.InputLayer(input_shape=(input_dim,)),
+    # Raw features (e.g. volume) can exceed float16's range, so the first layer stays in float32
+    tf.keras.layers.Dense(32, activation='relu', dtype='float32'),
     tf.keras.layers.Dense(32, activation='relu'),
     tf.keras.layers.Dense(32, activation='relu'),
     tf.keras.layers.Dense(32, activation='relu'),
     tf.keras.layers.Dense(32, activation='relu'),
     tf.keras.layers.Dense(32, activation='relu'),
-    tf.keras.layers.Dense(32, activation='relu'),
-    tf.keras.layers.Dense(output_dim)  # no activation => outputs can be any real number (negative or positive)
+    tf.keras.layers.Dense(output_dim, dtype='float32')  # no activation => outputs can be any real number; float32 keeps the loss in full precision
 ])
 
 model.compile(
     optimizer=tf.keras.optimizers.Adam(learning_rate=1e-4),
     loss='mean_squared_error',  # suitable for multi-label binary classification
-    metrics=['mean_squared_error']         # track accuracy; can add others
+    metrics=['mean_squared_error'],        # track accuracy; can add others
+    jit_compile=True                       # XLA fuses the Dense+ReLU chain
 )
 
 model.summary()
@@ -107,21 +119,53 @@ model.summary()
 # -------------------------
 # 5. Train the Model
 # -------------------------
+batch_size = 300000
+
+# Hold out the last 20% of the training rows for validation (what validation_split did)
+val_count = int(len(idx_train) * 0.2)
+idx_fit, idx_val = idx_train[:-val_count], idx_train[-val_count:]
+
+
+def take_rows(rows):
+    # Sorted rows read the memmap front to back; the order inside a batch doesn't matter
+    rows = np.sort(rows)
+    return X[rows], y[rows]
+
+
+def memmap_batches(rows, shuffle=False):
+    """tf.data pipeline reading the batches of `rows` from the memmap while the previous one trains."""
+    ds = tf.data.Dataset.from_tensor_slices(rows)
+    if shuffle:
+        ds = ds.shuffle(len(rows), reshuffle_each_iteration=True)  # shuffles indices only
+    return (
+        ds.batch(batch_size)
+        .map(lambda r: tf.numpy_function(take_rows, [r], (tf.float32, tf.float32)),
+             num_parallel_calls=tf.data.AUTOTUNE)
+        .map(lambda xb, yb: (tf.ensure_shape(xb, (None, input_dim)), tf.ensure_shape(yb, (None, output_dim))))
+        .prefetch(tf.data.AUTOTUNE)
+    )
+
+
+train_ds = memmap_batches(idx_fit, shuffle=True)
+val_ds = memmap_batches(idx_val)
+
 history = model.fit(
-    X_train, y_train,
+    train_ds,
     epochs=600,
-    batch_size=300000,
-    validation_split=0.2,
-    verbose=1,
-    shuffle=True
+    validation_data=val_ds,
+    verbose=1
 )
 
 # -------------------------
 # 6. Evaluate
 # -------------------------
-test_loss, test_accuracy = model.evaluate(X_test, y_test)
+test_loss, test_accuracy = model.evaluate(memmap_batches(idx_test))
 print(f"Test Loss: {test_loss:.4f}, Test Accuracy: {test_accuracy:.4f}")
 
+# The memmap is only scratch space for this run
+del train_ds, val_ds, X
+os.remove(X_path)
+
 # -------------------------
 # 7. Save the Model
 # -------------------------
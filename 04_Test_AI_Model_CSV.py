@@ -1,23 +1,30 @@
 #!/usr/bin/env python3
+import os
 import pandas as pd
 import numpy as np
 import tensorflow as tf
 from tqdm import tqdm
+from lib.features import valid_rows
+
+# User settings
+model_path = "trained_model.h5"
+int8_model_path = "trained_model_int8.tflite"
+use_int8_model = True  # False = run the float Keras model (XLA) instead of the int8 TFLite copy
 
 # -------------------------
 # 1. Load your saved model
 # -------------------------
-model = tf.keras.models.load_model("trained_model.h5")
+model = tf.keras.models.load_model(model_path)
 print("Model loaded.")
 
 # -------------------------
 # 2. Load the data to predict on (features only)
 # -------------------------
-df_to_predict = pd.read_csv("training_data/x_data.csv")
+df_to_predict = pd.read_parquet("training_data/x_data")
 
-# If your y data had columns like 'sell_signal'/'buy_signal' or 'datetime', remove them from X
+# If your y data had columns like 'sell_signal'/'buy_signal' or 'ts_ms', remove them from X
 y_columns = ['sell_signal', 'buy_signal']  
-columns_to_remove = y_columns + ['datetime']  
+columns_to_remove = y_columns + ['ts_ms']  
 X_predict_df = df_to_predict.drop(columns=columns_to_remove, errors='ignore')
 
 print(f"Features for prediction: {X_predict_df.shape[1]} columns.")
@@ -25,23 +32,65 @@ print(f"Features for prediction: {X_predict_df.shape[1]} columns.")
 X_predict = X_predict_df.select_dtypes(include=[np.number]).values.astype(np.float32)
 
 # Drop rows with NaNs
-valid_mask = ~np.isnan(X_predict).any(axis=1)
+valid_mask = valid_rows(X_predict)
 X_predict = X_predict[valid_mask]
 
 # -------------------------
-# 3. Predict in batches with progress bar
+# 3. Predict
 # -------------------------
-batch_size = 512
 num_samples = X_predict.shape[0]
 all_predictions = []
 
-for start_idx in tqdm(range(0, num_samples, batch_size), desc="Predicting"):
-    end_idx = start_idx + batch_size
-    batch_X = X_predict[start_idx:end_idx]
-    
-    # Model now outputs a single value per row
-    batch_pred = model.predict(batch_X, verbose=0)  # shape: (batch_size, 1)
-    all_predictions.append(batch_pred)
+if use_int8_model:
+    # Full-integer TFLite copy of the model: int8 weights/activations run on the
+    # CPU's integer dot-product units and move a quarter of the bytes of fp32.
+    # Re-convert whenever the Keras model is newer than the cached file.
+    if (not os.path.exists(int8_model_path)
+            or os.path.getmtime(int8_model_path) < os.path.getmtime(model_path)):
+        # Calibrate activation ranges on rows spread across the whole history
+        calibration_rows = np.linspace(0, num_samples - 1, min(1000, num_samples)).astype(int)
+
+        def representative_dataset():
+            for i in calibration_rows:
+                yield [X_predict[i:i + 1]]
+
+        converter = tf.lite.TFLiteConverter.from_keras_model(model)
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        with open(int8_model_path, "wb") as f:
+            f.write(converter.convert())
+        print(f"Int8 model saved to {int8_model_path}")
+
+    interpreter = tf.lite.Interpreter(model_path=int8_model_path, num_threads=os.cpu_count())
+    input_index = interpreter.get_input_details()[0]['index']
+    output_index = interpreter.get_output_details()[0]['index']
+
+    def run_int8(batch_X):
+        interpreter.resize_tensor_input(input_index, batch_X.shape)
+        interpreter.allocate_tensors()
+        interpreter.set_tensor(input_index, batch_X)
+        interpreter.invoke()
+        return interpreter.get_tensor(output_index).copy()
+
+    # Quantisation costs a little accuracy; show how far int8 drifts from the float model
+    check_X = X_predict[:min(10_000, num_samples)]
+    drift = np.abs(run_int8(check_X) - model(check_X, training=False).numpy()).max()
+    print(f"Int8 vs float model, max abs difference on {len(check_X)} rows: {drift:.6f}")
+
+    chunk_size = 65_536
+    for start_idx in tqdm(range(0, num_samples, chunk_size), desc="Predicting"):
+        all_predictions.append(run_int8(X_predict[start_idx:start_idx + chunk_size]))
+else:
+    # Calling the model directly skips Keras' per-call predict() machinery, and the
+    # tf.function wrapper lets XLA compile the whole forward pass into fused kernels.
+    predict_fn = tf.function(lambda x: model(x, training=False), jit_compile=True)
+
+    # A few very large chunks keep memory bounded on long histories
+    chunk_size = 1_000_000
+    for start_idx in tqdm(range(0, num_samples, chunk_size), desc="Predicting"):
+        chunk_X = tf.constant(X_predict[start_idx:start_idx + chunk_size])
+        all_predictions.append(predict_fn(chunk_X).numpy())  # shape: (chunk_size, 1)
 
 predictions = np.concatenate(all_predictions, axis=0)  # shape: (num_samples, 1)
 
@@ -55,6 +104,9 @@ pred_df = pd.DataFrame(predictions, columns=['pred_value'])
 final_df = df_to_predict.loc[valid_mask].reset_index(drop=True).copy()
 pred_df = pred_df.reset_index(drop=True)
 
+# Readable timestamps for the output, built from the int64 epoch-ms key
+final_df.insert(0, 'datetime', pd.to_datetime(final_df['ts_ms'].to_numpy(), unit='ms', utc=True))
+
 # Concatenate side by side
 final_df = pd.concat([final_df, pred_df], axis=1)
 
@@ -1,10 +1,10 @@
 import backtrader as bt
-import datetime as dt
 from backtrader_binance import BinanceStore
 from datetime import datetime
 
 from ConfigBinance.Config import Config  # Configuration file
 
+from lib.feed_binance_websocket import BinanceKlineData
 from lib.strategy_03_CustomBollinger import CustomBollingerStrategy
 from lib.strategy_02_market_average_with_stop_loss import market_average_with_stop_loss
 from lib.strategy_06_bollinger_with_stop_loss import CustomBollingerStrategySL
@@ -26,11 +26,13 @@ if __name__ == '__main__':
     broker = store.getbroker()
     cerebro.setbroker(broker)
 
-    # Historical 1-minute bars for the last hour + new live bars / timeframe M1
-    from_date = dt.datetime.now(dt.UTC) - dt.timedelta(minutes=600)
-    data = store.getdata(timeframe=bt.TimeFrame.Minutes, compression=1, dataname=symbol, start_date=from_date, LiveBars=True)
+    # Historical 1-minute bars for the last 600 minutes + new live bars / timeframe M1.
+    # Closed bars are pushed over Binance's kline WebSocket instead of polled over REST.
+    # The feed registers the symbol with the store (order filters, fill routing) for the broker.
+    data = BinanceKlineData(dataname=symbol, interval='1m', backfill_minutes=600, store=store,
+                            timeframe=bt.TimeFrame.Minutes, compression=1)
 
-    cerebro.adddata(data)  # Adding data
+    cerebro.adddata(data, name=symbol)  # Adding data (the broker sends orders for data._name)
 
     cerebro.addstrategy(market_average_with_stop_loss)  # Adding a trading system
 
@@ -0,0 +1,216 @@
+import os
+import json
+import h5py
+import numpy as np
+from lib.features import valid_rows
+
+"""
+ONNX Runtime inference for the trained AI model.
+
+A Keras `predict` call spends far longer in Python/TF dispatch than in the
+few small matmuls of the MLP, so the .h5 is exported to ONNX once and run
+through ONNX Runtime. Backtests know every bar up front, so the whole
+feature matrix goes through the model in a single call instead of one
+call per bar.
+
+The fp32 model is a plain stack of Dense layers, so `NumpyPredictor` runs
+it straight from the .h5 weights (read with h5py, no TensorFlow): one
+GEMM + activation per layer over the whole feature matrix.
+
+Optionally the ONNX model is statically quantised to int8 (QLinearMatMul /
+QLinearAdd kernels), calibrated on feature rows from the data being tested.
+"""
+
+
+def export_onnx(model_path, onnx_path=None, opset=17):
+    """
+    Convert a Keras .h5 model to ONNX next to it (e.g. trained_model.onnx).
+    The conversion is skipped while the ONNX file is newer than the .h5.
+
+    :return: Path of the ONNX model
+    """
+    if onnx_path is None:
+        onnx_path = os.path.splitext(model_path)[0] + ".onnx"
+    if os.path.exists(onnx_path) and os.path.getmtime(onnx_path) >= os.path.getmtime(model_path):
+        return onnx_path
+
+    # Only needed for the one-off export
+    import tensorflow as tf
+    import tf2onnx
+
+    model = tf.keras.models.load_model(model_path, compile=False)
+    input_signature = (tf.TensorSpec((None, model.inputs[0].shape[1]), tf.float32, name='input'),)
+
+    # tf2onnx.convert.from_keras can't trace Keras 3 models, so export the forward pass as a tf.function
+    @tf.function(input_signature=input_signature)
+    @tf.autograph.experimental.do_not_convert
+    def forward(x):
+        return model(x, training=False)
+
+    tf2onnx.convert.from_function(forward, input_signature=input_signature, opset=opset, output_path=onnx_path)
+    print(f"Exported {model_path} to {onnx_path}")
+    return onnx_path
+
+
+# Dense layer activations NumpyPredictor can evaluate
+ACTIVATIONS = {
+    'linear': lambda x: x,
+    'relu': lambda x: np.maximum(x, 0, out=x),
+    'sigmoid': lambda x: 1 / (1 + np.exp(-x)),
+    'tanh': np.tanh,
+}
+
+
+def export_weights(model_path, npz_path=None):
+    """
+    Save the Dense layers of a Keras .h5 model as float32 NumPy arrays next to
+    it (e.g. trained_model.npz): kernel_i, bias_i and the activation of layer i.
+    The .h5 is read with h5py, so TensorFlow is never imported. Skipped while
+    the .npz file is newer than the .h5.
+
+    :return: Path of the .npz weights
+    """
+    if npz_path is None:
+        npz_path = os.path.splitext(model_path)[0] + ".npz"
+    if os.path.exists(npz_path) and os.path.getmtime(npz_path) >= os.path.getmtime(model_path):
+        return npz_path
+
+    arrays = {}
+    with h5py.File(model_path, 'r') as f:
+        config = json.loads(f.attrs['model_config'])
+        weights = f['model_weights']
+        for layer in config['config']['layers']:
+            if layer['class_name'] == 'InputLayer':
+                continue
+            if layer['class_name'] != 'Dense':
+                raise ValueError(f"Only Dense layers can be exported, got {layer['class_name']}")
+            activation = layer['config']['activation']
+            if activation not in ACTIVATIONS:
+                raise ValueError(f"Unsupported activation: {activation}")
+            group = weights[layer['config']['name']]
+            # weight_names lists the layer's weights in order: kernel, bias
+            kernel, bias = (group[name][()] for name in group.attrs['weight_names'])
+            i = len(arrays) // 3
+            arrays[f'kernel_{i}'] = kernel.astype(np.float32)
+            arrays[f'bias_{i}'] = bias.astype(np.float32)
+            arrays[f'activation_{i}'] = np.array(activation)
+
+    np.savez(npz_path, **arrays)
+    print(f"Exported {model_path} weights to {npz_path}")
+    return npz_path
+
+
+def quantize_onnx(onnx_path, calibration_features, int8_path=None, n_rows=200):
+    """
+    Statically quantise an ONNX model to int8 weights and activations, with
+    activation ranges calibrated on `n_rows` complete feature rows spread
+    evenly across `calibration_features`. The model is written in operator
+    format, so ORT runs the integer QLinear kernels end to end rather than
+    dequantising around float ops. Activations are uint8 with int8 weights,
+    the u8s8 combination ORT's x86 (AVX2/VNNI) GEMM kernels are built for.
+    Skipped while the int8 file is newer.
+
+    :param calibration_features: (N, num_features) float32 feature rows, NaN rows are ignored
+    :return: Path of the int8 ONNX model
+    """
+    if int8_path is None:
+        int8_path = os.path.splitext(onnx_path)[0] + "_int8.onnx"
+    if os.path.exists(int8_path) and os.path.getmtime(int8_path) >= os.path.getmtime(onnx_path):
+        return int8_path
+
+    rows = calibration_features[valid_rows(calibration_features)]
+    if len(rows) == 0:
+        raise ValueError("No complete feature rows to calibrate the int8 model on")
+    rows = rows[np.linspace(0, len(rows) - 1, min(n_rows, len(rows))).astype(int)]
+
+    # Only needed for the one-off quantisation
+    from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+
+    class _CalibrationRows(CalibrationDataReader):
+        """Feeds feature rows to the static quantiser one (1, num_features) batch at a time."""
+
+        def __init__(self, input_name, rows):
+            self._feeds = iter({input_name: rows[i:i + 1]} for i in range(len(rows)))
+
+        def get_next(self):
+            return next(self._feeds, None)
+
+    input_name = create_session(onnx_path).get_inputs()[0].name
+    quantize_static(
+        onnx_path, int8_path, _CalibrationRows(input_name, rows),
+        quant_format=QuantFormat.QOperator,
+        per_channel=True,
+        reduce_range=False,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+    )
+    print(f"Int8 model saved to {int8_path}")
+    return int8_path
+
+
+def create_session(onnx_path, threads=0):
+    """ONNX Runtime CPU session with full graph optimisation (threads=0 lets ORT use every core)."""
+    # Imported here so NumpyPredictor and export_weights work without onnxruntime installed
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    options.intra_op_num_threads = threads
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    options.add_session_config_entry("session.disable_prepacking", "0")
+    return ort.InferenceSession(onnx_path, sess_options=options, providers=['CPUExecutionProvider'])
+
+
+class NumpyPredictor:
+    """
+    Runs the fp32 model over a whole (N, num_features) feature matrix with
+    NumPy, from the weights saved by `export_weights`.
+    """
+
+    def __init__(self, model_path):
+        with np.load(export_weights(model_path)) as z:
+            n_layers = len(z.files) // 3
+            self.layers = [
+                (z[f'kernel_{i}'], z[f'bias_{i}'], ACTIVATIONS[str(z[f'activation_{i}'])])
+                for i in range(n_layers)
+            ]
+
+    def predict(self, features):
+        """
+        :param features: (N, num_features) float32 array
+        :return: (N,) float32 predictions, NaN where a row has missing features
+        """
+        predictions = np.full(len(features), np.nan, dtype=np.float32)
+        valid = valid_rows(features)
+        if valid.any():
+            h = features[valid]
+            for kernel, bias, activation in self.layers:
+                h = h @ kernel
+                h += bias
+                h = activation(h)
+            predictions[valid] = h[:, 0]
+        return predictions
+
+
+class OnnxPredictor:
+    """
+    Runs the exported model over a whole (N, num_features) feature matrix at
+    once. Passing `calibration_features` runs the int8 quantised model instead.
+    """
+
+    def __init__(self, model_path, calibration_features=None):
+        onnx_path = export_onnx(model_path)
+        if calibration_features is not None:
+            onnx_path = quantize_onnx(onnx_path, calibration_features)
+        self.session = create_session(onnx_path)
+        self._input_name = self.session.get_inputs()[0].name
+
+    def predict(self, features):
+        """
+        :param features: (N, num_features) float32 array
+        :return: (N,) float32 predictions, NaN where a row has missing features
+        """
+        predictions = np.full(len(features), np.nan, dtype=np.float32)
+        valid = valid_rows(features)
+        if valid.any():
+            predictions[valid] = self.session.run(None, {self._input_name: features[valid]})[0][:, 0]
+        return predictions
@@ -0,0 +1,20 @@
+import time
+import backtrader as bt
+from datetime import datetime
+
+"""
+Bar times on Backtrader's scale.
+
+Backtrader stores bar times as float days (`bt.date2num`). With the Unix
+epoch on that scale, a bar time converts to and from epoch seconds with one
+subtraction and one multiplication, without building datetimes, which is
+what the live feed and the strategies' live-lag checks do on every bar.
+"""
+
+# Backtrader stores bar times as float days; this is the Unix epoch on that scale
+EPOCH_NUM = bt.date2num(datetime(1970, 1, 1))
+
+
+def bar_lag_seconds(data):
+    """Seconds from the current bar's time (UTC) of `data` to now."""
+    return time.time() - (data.datetime[0] - EPOCH_NUM) * 86400.0
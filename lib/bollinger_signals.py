@@ -0,0 +1,214 @@
+import numpy as np
+import backtrader as bt
+from numba import njit
+from lib.broker_cash import buy_cash, sell_cash, fill_price
+
+"""
+Compiled decision loops for the Bollinger strategies' quiet backtests.
+
+In a runonce backtest the close prices and the bands of the whole feed are
+known once the strategy reaches its first bar, so instead of working out the
+buy/sell rules bar by bar in Python, a Numba kernel runs them over the arrays
+in one call and returns a signal per bar, which the strategy's next() then
+only has to replay (placing the same orders it would have placed itself).
+
+The rules depend on what the broker did with earlier orders, so the kernels
+also mirror Backtrader's default broker for these strategies:
+
+- market orders fill at the next bar's open, paying a percentage commission
+  on the traded value (`lib.broker_cash`, so the cash matches exactly)
+- a buy the cash can't cover, either at the creation close (submit check) or
+  at the filling open, is refused (Margin) and the strategy stays flat
+
+If the broker still disagrees with a kernel about how an order ended (see
+`as_expected`), the strategy drops the signals and goes back to the bar by
+bar rules from there on.
+"""
+
+HOLD = 0
+BUY = 1
+BUY_REFUSED = 2   # a buy the broker will refuse for lack of cash
+SELL = -1
+
+
+def backtest_commission(strategy):
+    """
+    Commission rate of the strategy's broker, or None if the broker does
+    something the kernels don't mirror (cheat-on-close/open, slippage, volume
+    fillers, fixed or futures-like commissions, interest, ...).
+    """
+    broker = strategy.broker
+    if not isinstance(broker, bt.brokers.BackBroker):
+        return None
+    p = broker.p
+    if p.coc or p.coo or p.slip_perc or p.slip_fixed or p.filler is not None or not p.checksubmit:
+        return None
+    comminfo = broker.getcommissioninfo(strategy.data)
+    if (comminfo._commtype != bt.CommInfoBase.COMM_PERC or not comminfo._stocklike
+            or comminfo.p.mult != 1.0 or comminfo.get_leverage() != 1.0 or comminfo.p.interest):
+        return None
+    return comminfo.p.commission
+
+
+def as_expected(order, signal):
+    """Whether a finished `order` ended the way the kernel's `signal` for it said it would."""
+    if signal == BUY_REFUSED:
+        return order.status != order.Completed
+    return order.status == order.Completed
+
+
+@njit(cache=True)
+def custom_bollinger_signals(opens, closes, lower, upper, start, cash, commission, min_order):
+    """
+    CustomBollingerStrategy from bar `start` on, starting flat with `cash`:
+    buy (cash / close) * 0.95 when close < lower (and cash >= min_order),
+    sell it when close > upper.
+    """
+    n = closes.size
+    signals = np.zeros(n, np.int8)
+    size = 0.0          # position size, 0 = flat
+    entry = 0.0         # position price
+    order_size = 0.0
+    for i in range(start, n):
+        # The order placed on the previous bar fills at this bar's open, before next() runs
+        if signals[i - 1] == BUY:
+            if (buy_cash(cash, order_size, closes[i - 1], commission) < 0.0
+                    or buy_cash(cash, order_size, opens[i], commission) < 0.0):
+                signals[i - 1] = BUY_REFUSED
+            else:
+                cash = buy_cash(cash, order_size, opens[i], commission)
+                size = order_size
+                entry = opens[i]
+        elif signals[i - 1] == SELL:
+            cash = sell_cash(cash, size, entry, opens[i], commission)
+            size = 0.0
+
+        c = closes[i]
+        if size == 0.0:
+            if cash >= min_order and c < lower[i]:
+                order_size = (cash / c) * 0.95
+                signals[i] = BUY
+        elif c > upper[i]:
+            signals[i] = SELL
+    return signals
+
+
+@njit(cache=True)
+def bollinger_sl_signals(opens, closes, lower, upper, start, cash, commission, min_order, stop_loss):
+    """
+    CustomBollingerStrategySL from bar `start` on, starting flat with `cash`:
+    buy (cash / close) * 0.95 when close < lower (and cash >= min_order),
+    sell it when close <= entry * (1 - stop_loss) or close > upper.
+    """
+    n = closes.size
+    signals = np.zeros(n, np.int8)
+    size = 0.0
+    entry = 0.0
+    order_size = 0.0
+    stop_factor = 1 - stop_loss
+    for i in range(start, n):
+        if signals[i - 1] == BUY:
+            if (buy_cash(cash, order_size, closes[i - 1], commission) < 0.0
+                    or buy_cash(cash, order_size, opens[i], commission) < 0.0):
+                signals[i - 1] = BUY_REFUSED
+            else:
+                cash = buy_cash(cash, order_size, opens[i], commission)
+                size = order_size
+                entry = opens[i]
+        elif signals[i - 1] == SELL:
+            cash = sell_cash(cash, size, entry, opens[i], commission)
+            size = 0.0
+
+        c = closes[i]
+        if size == 0.0:
+            if cash >= min_order and c < lower[i]:
+                order_size = (cash / c) * 0.95
+                signals[i] = BUY
+        elif c <= entry * stop_factor or c > upper[i]:
+            signals[i] = SELL
+    return signals
+
+
+@njit(cache=True)
+def trailing_stop_signals(opens, closes, lower, start, cash, commission, stake, trail_percent):
+    """
+    BollingerTrailingStopStrategy from bar `start` on, starting flat with `cash`:
+    buy `stake` when close < lower, sell it when close drops to
+    (1 - trail_percent) of the highest price since the entry.
+    """
+    n = closes.size
+    signals = np.zeros(n, np.int8)
+    size = 0.0
+    entry = 0.0
+    max_price = 0.0
+    trail_factor = 1 - trail_percent
+    for i in range(start, n):
+        if signals[i - 1] == BUY:
+            if (buy_cash(cash, stake, closes[i - 1], commission) < 0.0
+                    or buy_cash(cash, stake, opens[i], commission) < 0.0):
+                signals[i - 1] = BUY_REFUSED
+            else:
+                cash = buy_cash(cash, stake, opens[i], commission)
+                size = stake
+                entry = opens[i]
+                max_price = fill_price(stake, entry)  # the strategy starts from the executed price
+        elif signals[i - 1] == SELL:
+            cash = sell_cash(cash, size, entry, opens[i], commission)
+            size = 0.0
+
+        c = closes[i]
+        if size == 0.0:
+            if c < lower[i]:
+                signals[i] = BUY
+        else:
+            max_price = max(max_price, c)
+            if c <= max_price * trail_factor:
+                signals[i] = SELL
+    return signals
+
+
+@njit(cache=True)
+def deadband_trail_signals(opens, closes, lower, start, cash, commission, stop_loss, deadband, trail_percent):
+    """
+    BollingerDeadbandStopTrail from bar `start` on, starting flat with `cash`:
+    buy cash * 0.95 / close when close <= lower; sell it when close <=
+    entry * (1 - stop_loss), or when close is above entry * (1 + deadband) and
+    below (1 - trail_percent) of the highest such close (from the entry on).
+    """
+    n = closes.size
+    signals = np.zeros(n, np.int8)
+    size = 0.0
+    entry = 0.0
+    fill = 0.0
+    max_price = 0.0
+    order_size = 0.0
+    stop_factor = 1 - stop_loss
+    deadband_factor = 1 + deadband
+    trail_factor = 1 - trail_percent
+    for i in range(start, n):
+        if signals[i - 1] == BUY:
+            if (buy_cash(cash, order_size, closes[i - 1], commission) < 0.0
+                    or buy_cash(cash, order_size, opens[i], commission) < 0.0):
+                signals[i - 1] = BUY_REFUSED
+            else:
+                cash = buy_cash(cash, order_size, opens[i], commission)
+                size = order_size
+                entry = opens[i]
+                fill = fill_price(order_size, entry)  # the strategy's levels use the executed price
+                max_price = fill
+        elif signals[i - 1] == SELL:
+            cash = sell_cash(cash, size, entry, opens[i], commission)
+            size = 0.0
+
+        c = closes[i]
+        if size == 0.0:
+            if c <= lower[i]:
+                order_size = cash * 0.95 / c
+                signals[i] = BUY
+        elif c <= fill * stop_factor:
+            signals[i] = SELL
+        elif c > fill * deadband_factor:
+            max_price = max(max_price, c)
+            if c < max_price * trail_factor:
+                signals[i] = SELL
+    return signals
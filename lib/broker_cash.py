@@ -0,0 +1,38 @@
+from numba import njit
+
+"""
+Cash arithmetic of Backtrader's default broker, for the compiled kernels
+that replay a strategy without Cerebro (`bollinger_signals`, the
+`optimise_0N_*` sweeps, `strategy_JLA`).
+
+The broker books a percentage commission on the traded value and checks a
+buy against the cash both when it is submitted (at the creation close) and
+when it fills (at the next open); these use the same operations in the same
+order, so the kernels' cash matches Backtrader's to the last bit.
+"""
+
+
+@njit(cache=True)
+def buy_cash(cash, size, price, commission):
+    """Cash left after buying `size` at `price` (negative: the broker refuses the order)."""
+    cash -= size * price
+    cash -= size * commission * price
+    return cash
+
+
+@njit(cache=True)
+def sell_cash(cash, size, entry, price, commission):
+    """Cash after selling a long position of `size` opened at `entry`, at `price`."""
+    cash += size * entry + size * (price - entry)
+    cash -= size * commission * price
+    return cash
+
+
+@njit(cache=True)
+def fill_price(size, price):
+    """
+    `order.executed.price` of a market order filled in one go: Backtrader
+    averages it as (0 + size * price) / size, which can be off from `price`
+    in the last bit (position.price, on the other hand, is `price` itself).
+    """
+    return (0.0 + size * price) / size
@@ -0,0 +1,404 @@
+import numpy as np
+import pandas as pd
+from numba import njit, prange
+from numpy.lib.stride_tricks import sliding_window_view
+
+"""
+Vectorised indicator features for the AI model.
+
+These functions reproduce the Backtrader indicators that the X training data
+has always been built from (RSI, Bollinger, Aroon, AwesomeOscillator,
+Ichimoku, TEMA, MACD and ATR for the 5/30/200 period sets), but compute each
+one over the whole price history in a single pandas/NumPy pass instead of
+pulling values out bar-by-bar inside a `bt.Strategy`. The recursive
+smoothers (EMA, Wilder RSI/ATR) can't be vectorised, so they run as Numba
+compiled loops over plain float64 arrays.
+
+Backtrader seeds its exponential smoothers (EMA/SMMA) with the simple average
+of the first `period` values, so the helpers below do the same to keep the
+features identical to the ones the model was trained on.
+
+`compute_features_with_state` / `extend_features` let the feature history be
+extended with new bars only: the smoothers resume from their saved values and
+the rolling windows only need the last `STATE_TAIL_BARS` raw bars.
+"""
+
+OHLCV_COLUMNS = ['open', 'high', 'low', 'close', 'volume']
+
+# Longest lookback of the rolling features (Aroon 200 looks at 201 bars), i.e. how
+# many raw bars `extend_features` needs in front of the new ones.
+STATE_TAIL_BARS = 200
+
+# Column order the model was trained with (datetime excluded).
+FEATURE_COLUMNS = [
+    'open', 'high', 'low', 'close', 'volume',
+    'rsi_5', 'rsi_30', 'rsi_200',
+    'bb_5_top', 'bb_5_mid', 'bb_5_bot',
+    'bb_30_top', 'bb_30_mid', 'bb_30_bot',
+    'bb_200_top', 'bb_200_mid', 'bb_200_bot',
+    'aroon_up_5', 'aroon_down_5',
+    'aroon_up_30', 'aroon_down_30',
+    'aroon_up_200', 'aroon_down_200',
+    'ao_5', 'ao_30', 'ao_200',
+    'ichimoku_tenkan', 'ichimoku_kijun',
+    'tema_5', 'tema_30', 'tema_200',
+    'macd_5', 'macd_5_signal',
+    'macd_30', 'macd_30_signal',
+    'macd_200', 'macd_200_signal',
+    'atr_5', 'atr_30', 'atr_200',
+]
+
+
+@njit(cache=True)
+def _seeded_smoothing(values, alpha, period, prev=np.nan, start=0):
+    """
+    Exponential smoothing seeded with the SMA of the first `period` valid values.
+    Leading NaNs (e.g. when chaining EMAs for TEMA/MACD signal) are skipped.
+    If `prev` is given the seeding is skipped and smoothing resumes from it at `start`.
+    """
+    n = values.size
+    out = np.full(n, np.nan)
+    alpha1 = 1.0 - alpha
+    if np.isnan(prev):
+        first = start
+        while first < n and np.isnan(values[first]):
+            first += 1
+        seed_idx = first + period - 1
+        if seed_idx >= n:
+            return out
+
+        acc = 0.0
+        for i in range(first, seed_idx + 1):
+            acc += values[i]
+        prev = acc / period
+        out[seed_idx] = prev
+        start = seed_idx + 1
+
+    for i in range(start, n):
+        prev = prev * alpha1 + values[i] * alpha
+        out[i] = prev
+    return out
+
+
+@njit(cache=True, error_model='numpy')
+def _wilder_rsi(close, period, avg_gain=np.nan, avg_loss=np.nan, start=1):
+    """Returns (rsi, avg_gain, avg_loss) so a later call can resume from the averages."""
+    n = close.size
+    out = np.full(n, np.nan)
+    if np.isnan(avg_gain):
+        if n <= period:
+            return out, avg_gain, avg_loss
+
+        avg_gain = 0.0
+        avg_loss = 0.0
+        for i in range(1, period + 1):
+            delta = close[i] - close[i - 1]
+            if delta > 0.0:
+                avg_gain += delta
+            else:
+                avg_loss -= delta
+        avg_gain /= period
+        avg_loss /= period
+        out[period] = 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+        start = period + 1
+
+    for i in range(start, n):
+        delta = close[i] - close[i - 1]
+        gain = delta if delta > 0.0 else 0.0
+        loss = -delta if delta < 0.0 else 0.0
+        avg_gain = (avg_gain * (period - 1) + gain) / period
+        avg_loss = (avg_loss * (period - 1) + loss) / period
+        out[i] = 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+    return out, avg_gain, avg_loss
+
+
+@njit(cache=True)
+def _wilder_atr(high, low, close, period, prev=np.nan, start=1):
+    n = close.size
+    out = np.full(n, np.nan)
+    if np.isnan(prev):
+        if n <= period:
+            return out
+
+        # TrueRange needs the previous close, so it starts on the second bar.
+        acc = 0.0
+        for i in range(1, period + 1):
+            acc += max(high[i], close[i - 1]) - min(low[i], close[i - 1])
+        prev = acc / period
+        out[period] = prev
+        start = period + 1
+
+    for i in range(start, n):
+        true_range = max(high[i], close[i - 1]) - min(low[i], close[i - 1])
+        prev = (prev * (period - 1) + true_range) / period
+        out[i] = prev
+    return out
+
+
+@njit(cache=True)
+def sma_update(prev_sma, new_value, dropped_value, period):
+    """
+    O(1) rolling-mean step for live use: slide the window forward by one bar,
+    adding `new_value` and removing the bar that fell out (`dropped_value`).
+    """
+    return prev_sma + (new_value - dropped_value) / period
+
+
+@njit(cache=True, parallel=True)
+def valid_rows(X, y=None):
+    """
+    Boolean mask of the rows with no NaN in `X` (and in `y`, if given). One
+    fused pass per row instead of building a full (N, K) isnan matrix first.
+    """
+    n = X.shape[0]
+    out = np.ones(n, dtype=np.bool_)
+    for i in prange(n):
+        ok = True
+        for j in range(X.shape[1]):
+            if np.isnan(X[i, j]):
+                ok = False
+                break
+        if ok and y is not None:
+            for j in range(y.shape[1]):
+                if np.isnan(y[i, j]):
+                    ok = False
+                    break
+        out[i] = ok
+    return out
+
+
+class _Smoothers:
+    """
+    Runs the recursive smoothers (EMA chains, Wilder RSI/ATR) under a state key.
+    With `prev` (a state dict from an earlier run) each smoother resumes from its
+    stored value at row `start` instead of re-seeding; the final values of this
+    run are collected in `last` so they can be saved for the next one.
+    """
+
+    def __init__(self, prev=None, start=0):
+        self.prev = prev if prev is not None else {}
+        self.start = start
+        self.last = {}
+
+    def _resume(self, key):
+        return float(self.prev.get(key, np.nan))
+
+    def smooth(self, key, values, alpha, period):
+        out = _seeded_smoothing(values, alpha, period, self._resume(key), self.start)
+        self.last[key] = out[-1]
+        return out
+
+    def ema(self, key, values, period):
+        return self.smooth(key, values, 2.0 / (period + 1), period)
+
+    def rsi(self, key, close, period):
+        out, avg_gain, avg_loss = _wilder_rsi(
+            close, period, self._resume(f'{key}_gain'), self._resume(f'{key}_loss'), max(self.start, 1)
+        )
+        self.last[f'{key}_gain'] = avg_gain
+        self.last[f'{key}_loss'] = avg_loss
+        return out
+
+    def atr(self, key, high, low, close, period):
+        out = _wilder_atr(high, low, close, period, self._resume(key), max(self.start, 1))
+        self.last[key] = out[-1]
+        return out
+
+    def tema(self, key, close, period):
+        ema1 = self.ema(f'{key}_1', close, period)
+        ema2 = self.ema(f'{key}_2', ema1, period)
+        ema3 = self.ema(f'{key}_3', ema2, period)
+        return 3.0 * ema1 - 3.0 * ema2 + ema3
+
+    def macd(self, key, close, fast, slow, signal):
+        macd_line = self.ema(f'{key}_fast', close, fast) - self.ema(f'{key}_slow', close, slow)
+        return macd_line, self.ema(f'{key}_signal', macd_line, signal)
+
+
+def _values(series):
+    return series.to_numpy(dtype=np.float64)
+
+
+def ema(series, period):
+    """Backtrader ExponentialMovingAverage (alpha = 2 / (period + 1))."""
+    return pd.Series(_Smoothers().ema('ema', _values(series), period), index=series.index)
+
+
+def smma(series, period):
+    """Backtrader SmoothedMovingAverage / Wilder smoothing (alpha = 1 / period)."""
+    return pd.Series(_Smoothers().smooth('smma', _values(series), 1.0 / period, period), index=series.index)
+
+
+def rsi(close, period):
+    return pd.Series(_Smoothers().rsi('rsi', _values(close), period), index=close.index)
+
+
+def bollinger(close, period, devfactor=2.0):
+    """Returns (top, mid, bot). Backtrader uses the population standard deviation."""
+    mid = close.rolling(period).mean()
+    sd = close.rolling(period).std(ddof=0)
+    return mid + devfactor * sd, mid, mid - devfactor * sd
+
+
+def aroon(high, low, period):
+    """
+    Returns (up, down). Backtrader looks at `period + 1` bars and measures how many
+    bars ago the most recent highest high / lowest low happened.
+    """
+    window = period + 1
+    up = np.full(len(high), np.nan)
+    down = np.full(len(low), np.nan)
+    if len(high) >= window:
+        # Non-copying (N - period, period + 1) views, reversed so argmax/argmin
+        # return the most recent extreme as "bars ago".
+        highs = sliding_window_view(_values(high), window)[:, ::-1]
+        lows = sliding_window_view(_values(low), window)[:, ::-1]
+        up[period:] = 100.0 / period * (period - highs.argmax(axis=1))
+        down[period:] = 100.0 / period * (period - lows.argmin(axis=1))
+    return pd.Series(up, index=high.index), pd.Series(down, index=low.index)
+
+
+def awesome_oscillator(high, low, fast, slow):
+    median = (high + low) / 2.0
+    return median.rolling(fast).mean() - median.rolling(slow).mean()
+
+
+def ichimoku(high, low, tenkan=9, kijun=26):
+    """Returns (tenkan_sen, kijun_sen) - the only Ichimoku lines used as features."""
+    tenkan_sen = (high.rolling(tenkan).max() + low.rolling(tenkan).min()) / 2.0
+    kijun_sen = (high.rolling(kijun).max() + low.rolling(kijun).min()) / 2.0
+    return tenkan_sen, kijun_sen
+
+
+def tema(close, period):
+    return pd.Series(_Smoothers().tema('tema', _values(close), period), index=close.index)
+
+
+def macd(close, fast, slow, signal):
+    """Returns (macd, signal)."""
+    macd_line, signal_line = _Smoothers().macd('macd', _values(close), fast, slow, signal)
+    return pd.Series(macd_line, index=close.index), pd.Series(signal_line, index=close.index)
+
+
+def atr(high, low, close, period):
+    values = _Smoothers().atr('atr', _values(high), _values(low), _values(close), period)
+    return pd.Series(values, index=close.index)
+
+
+class _FeatureBlock:
+    """
+    Preallocated column-major (N, len(FEATURE_COLUMNS)) float64 block. Each
+    `block[name] = values` writes straight into that feature's contiguous column,
+    so no per-feature Series have to be gathered and copied into a DataFrame later.
+    """
+
+    _index = {name: i for i, name in enumerate(FEATURE_COLUMNS)}
+
+    def __init__(self, n_rows):
+        self.values = np.empty((n_rows, len(FEATURE_COLUMNS)), order='F')
+
+    def __setitem__(self, name, values):
+        self.values[:, self._index[name]] = values
+
+    def to_frame(self, index):
+        # The transposed block is C-contiguous, which is exactly pandas' internal layout
+        return pd.DataFrame(self.values, index=index, columns=FEATURE_COLUMNS, copy=False)
+
+
+def _build_features(data, smoothers):
+    o, h, l, c, v = (data[col].astype(np.float64) for col in ('open', 'high', 'low', 'close', 'volume'))
+    features = _FeatureBlock(len(data))
+    features['open'] = o
+    features['high'] = h
+    features['low'] = l
+    features['close'] = c
+    features['volume'] = v
+    c_values, h_values, l_values = _values(c), _values(h), _values(l)
+
+    for n in (5, 30, 200):
+        features[f'rsi_{n}'] = smoothers.rsi(f'rsi_{n}', c_values, n)
+
+    for n in (5, 30, 200):
+        top, mid, bot = bollinger(c, n)
+        features[f'bb_{n}_top'] = top
+        features[f'bb_{n}_mid'] = mid
+        features[f'bb_{n}_bot'] = bot
+
+    for n in (5, 30, 200):
+        up, down = aroon(h, l, n)
+        features[f'aroon_up_{n}'] = up
+        features[f'aroon_down_{n}'] = down
+
+    # AwesomeOscillator (fast, slow) pairs used for the "5/30/200" versions
+    for n, fast in ((5, 3), (30, 10), (200, 50)):
+        features[f'ao_{n}'] = awesome_oscillator(h, l, fast, n)
+
+    features['ichimoku_tenkan'], features['ichimoku_kijun'] = ichimoku(h, l)
+
+    for n in (5, 30, 200):
+        features[f'tema_{n}'] = smoothers.tema(f'tema_{n}', c_values, n)
+
+    # MACD (fast, slow, signal) scaled for the "5/30/200" versions
+    for n, fast, slow, signal in ((5, 4, 8, 3), (30, 12, 30, 9), (200, 50, 200, 20)):
+        features[f'macd_{n}'], features[f'macd_{n}_signal'] = smoothers.macd(f'macd_{n}', c_values, fast, slow, signal)
+
+    for n in (5, 30, 200):
+        features[f'atr_{n}'] = smoothers.atr(f'atr_{n}', h_values, l_values, c_values, n)
+
+    return features.to_frame(data.index)
+
+
+def _pack_state(data, smoothers):
+    """Smoother end values plus the last `STATE_TAIL_BARS` raw bars for the rolling windows."""
+    tail = data.iloc[-STATE_TAIL_BARS:]
+    state = {f'tail_{col}': tail[col].to_numpy(dtype=np.float64) for col in OHLCV_COLUMNS}
+    state['tail_ts_ms'] = tail.index.values.astype('datetime64[ms]').astype(np.int64)
+    state.update(smoothers.last)
+    return state
+
+
+def compute_features(data):
+    """
+    Build the full feature matrix for an OHLCV DataFrame (as returned by
+    `load_price_data`). Rows before every indicator has warmed up contain NaN.
+
+    :param data: DataFrame with open/high/low/close/volume columns
+    :return: DataFrame with `FEATURE_COLUMNS`, same index as `data`
+    """
+    return _build_features(data, _Smoothers())
+
+
+def compute_features_with_state(data):
+    """
+    Same as `compute_features`, but also returns the state `extend_features`
+    needs to carry the features on to later bars without starting over.
+
+    :param data: DataFrame with open/high/low/close/volume columns
+    :return: (features DataFrame, state dict of NumPy values - saveable with np.savez)
+    """
+    smoothers = _Smoothers()
+    features = _build_features(data, smoothers)
+    return features, _pack_state(data, smoothers)
+
+
+def extend_features(new_data, state):
+    """
+    Compute features for bars that follow the ones `state` was saved from.
+    The recursive smoothers resume from their stored values and the rolling
+    windows run over the stored tail, so the cost only depends on `len(new_data)`.
+
+    :param new_data: OHLCV DataFrame of bars strictly after the saved ones
+    :param state: State from `compute_features_with_state` / a previous `extend_features`
+    :return: (features DataFrame for `new_data`, updated state)
+    """
+    if new_data.empty:
+        return pd.DataFrame(columns=FEATURE_COLUMNS, index=new_data.index, dtype=np.float64), state
+
+    tail = pd.DataFrame(
+        {col: state[f'tail_{col}'] for col in OHLCV_COLUMNS},
+        index=pd.to_datetime(state['tail_ts_ms'], unit='ms'),
+    )
+    context = pd.concat([tail, new_data[OHLCV_COLUMNS].astype(np.float64)])
+    smoothers = _Smoothers(state, start=len(tail))
+    features = _build_features(context, smoothers).iloc[len(tail):]
+    return features, _pack_state(context, smoothers)
@@ -0,0 +1,170 @@
+import asyncio
+import logging
+import queue
+import threading
+import time
+import aiohttp
+import orjson
+import websockets
+import backtrader as bt
+from lib.bar_time import EPOCH_NUM
+
+"""
+Live Binance kline feed for Backtrader.
+
+Closed bars are pushed by Binance's `<symbol>@kline_<interval>` WebSocket
+stream instead of being polled over REST, so a bar reaches the strategy
+within about a second of closing. Before the stream starts (and after
+every reconnect) the missing history is backfilled from the REST klines
+endpoint, so the strategy's indicators warm up as before and no bar is
+lost across a dropped connection.
+
+The stream runs on an asyncio loop in a background thread and hands bars
+to `_load()` through a thread-safe queue, the same way Backtrader's own
+live feeds (IB, Oanda) do. Any error in the stream (network, or a frame it
+can't parse) is logged and the stream reconnects (CONNBROKEN); if the thread
+ends anyway, the feed reports DISCONNECTED and finishes instead of waiting
+for bars forever.
+
+When trading through `BinanceStore.getbroker()`, pass the store as `store`:
+the feed then registers its symbol with it on start, as `store.getdata()`
+does for the store's own feeds. The broker needs that to size orders (LOT_SIZE
+and tick filters) and to route fills for the symbol back to the strategy.
+"""
+
+REST_URL = "https://api.binance.com/api/v3/klines"
+STREAM_URL = "wss://stream.binance.com:9443/ws/{symbol}@kline_{interval}"
+KLINE_LIMIT = 1000  # Max klines Binance returns per REST request
+
+_logger = logging.getLogger(__name__)
+
+
+class BinanceKlineData(bt.feed.DataBase):
+
+    params = (
+        ('dataname', 'XRPUSDT'),  # Binance symbol
+        ('interval', '1m'),
+        ('backfill_minutes', 600),  # History loaded over REST before the live bars
+        ('reconnect_seconds', 5),   # Wait before reconnecting a dropped stream
+        ('qcheck', 0.5),            # Seconds _load() waits for a bar before handing control back
+        ('store', None),            # BinanceStore whose broker trades this symbol (None = data only)
+    )
+
+    def islive(self):
+        return True
+
+    def haslivedata(self):
+        return self._laststatus == self.LIVE and not self._bars.empty()
+
+    def start(self):
+        super().start()
+        store = self.p.store
+        if store is not None:
+            if self.p.dataname not in store.symbols:
+                store.symbols.append(self.p.dataname)
+            store.get_filters(symbol=self.p.dataname)
+        self._bars = queue.Queue()  # (ts_ms, open, high, low, close, volume) tuples or status codes
+        self._last_ts = None        # Open time of the newest bar queued (only used by the stream thread)
+        self._loop = asyncio.new_event_loop()
+        self._task = self._loop.create_task(self._stream())
+        self._thread = threading.Thread(target=self._run_stream, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if not self._loop.is_closed():
+            try:
+                self._loop.call_soon_threadsafe(self._task.cancel)
+            except RuntimeError:
+                pass  # the loop closed in between, the stream has already ended
+        self._thread.join(timeout=self.p.reconnect_seconds)
+        super().stop()
+
+    def _run_stream(self):
+        try:
+            self._loop.run_until_complete(self._task)
+        except asyncio.CancelledError:
+            pass  # stop() was called
+        except Exception:
+            _logger.exception("Binance kline stream for %s stopped", self.p.dataname)
+        finally:
+            self._loop.close()
+            self._bars.put(self.DISCONNECTED)
+
+    def _load(self):
+        try:
+            item = self._bars.get(timeout=self._qcheck)
+        except queue.Empty:
+            return None  # No bar yet, the feed is still alive
+
+        if isinstance(item, int):
+            self.put_notification(item)  # Status change from the stream thread
+            if item == self.DISCONNECTED:
+                return False  # the stream thread has ended, no more bars will come
+            return None
+
+        ts_ms, open_, high, low, close, volume = item
+        self.lines.datetime[0] = EPOCH_NUM + ts_ms / 86_400_000
+        self.lines.open[0] = open_
+        self.lines.high[0] = high
+        self.lines.low[0] = low
+        self.lines.close[0] = close
+        self.lines.volume[0] = volume
+        self.lines.openinterest[0] = 0.0
+        return True
+
+    def _put(self, ts_ms, open_, high, low, close, volume):
+        # REST backfill and the stream can both deliver the same bar around a (re)connect
+        if self._last_ts is not None and ts_ms <= self._last_ts:
+            return
+        self._last_ts = ts_ms
+        self._bars.put((ts_ms, float(open_), float(high), float(low), float(close), float(volume)))
+
+    async def _backfill(self, session):
+        """Queue the closed klines missing since the last bar (or the backfill window)."""
+        now_ms = int(time.time() * 1000)
+        if self._last_ts is None:
+            start_ms = now_ms - self.p.backfill_minutes * 60_000
+        else:
+            start_ms = self._last_ts + 1
+        while start_ms < now_ms:
+            params = {
+                'symbol': self.p.dataname,
+                'interval': self.p.interval,
+                'startTime': start_ms,
+                'limit': KLINE_LIMIT,
+            }
+            async with session.get(REST_URL, params=params) as response:
+                response.raise_for_status()
+                batch = orjson.loads(await response.read())
+
+            # Stop at the bar that is still open, the stream delivers it once it closes
+            closed = [k for k in batch if k[6] < now_ms]
+            for k in closed:
+                self._put(k[0], k[1], k[2], k[3], k[4], k[5])
+            if len(closed) < len(batch) or len(batch) < KLINE_LIMIT:
+                break
+            start_ms = batch[-1][0] + 1
+
+    async def _stream(self):
+        url = STREAM_URL.format(symbol=self.p.dataname.lower(), interval=self.p.interval)
+        async with aiohttp.ClientSession() as session:
+            while True:
+                try:
+                    async with websockets.connect(url) as ws:
+                        # Connected before backfilling, so no bar can close in between
+                        self._bars.put(self.DELAYED)
+                        await self._backfill(session)
+                        self._bars.put(self.LIVE)
+                        async for message in ws:
+                            k = orjson.loads(message)['k']
+                            if k['x']:  # Bar closed
+                                self._put(k['t'], k['o'], k['h'], k['l'], k['c'], k['v'])
+                except (OSError, aiohttp.ClientError, websockets.WebSocketException) as exc:
+                    _logger.warning("Binance kline stream for %s dropped (%r), reconnecting",
+                                    self.p.dataname, exc)
+                except Exception:
+                    # e.g. a frame that isn't a kline: don't let it end the feed silently
+                    _logger.exception("Unexpected error in the Binance kline stream for %s, reconnecting",
+                                      self.p.dataname)
+                self._bars.put(self.CONNBROKEN)
+                await asyncio.sleep(self.p.reconnect_seconds)
@@ -0,0 +1,368 @@
+import math
+import collections
+from array import array
+import numpy as np
+import backtrader as bt
+from numba import njit
+from numpy.lib.stride_tricks import sliding_window_view
+from lib.features import _seeded_smoothing, ema
+
+"""
+Custom Backtrader indicators shared by the strategies.
+
+`OnlineBollinger` replaces the SimpleMovingAverage + StandardDeviation pair
+(and the line arithmetic for the bands) used by the Bollinger strategies, with
+one indicator that writes only the middle band (for the plot) and the two
+bands the strategies trade on.
+Backtrader's SMA and StandardDeviation re-sum the whole window on every bar,
+which is O(period) work per bar with periods of 450-600; here the window's
+sum and sum of squares are updated as bars enter and leave, so each bar is
+O(1), both bar by bar (live) and in the runonce pass of a backtest.
+
+`NumbaSMA` is the moving average on its own, with the same running sum, for
+the strategies' `avg_type='SMA'`.
+
+`NumbaEMA` is Backtrader's ExponentialMovingAverage with the runonce pass
+(a Python loop over every bar of the feed) done by a compiled kernel, and
+`NumbaLaguerreRSI` the same for Backtrader's LaguerreRSI.
+
+`MOVING_AVERAGES` maps the market-average strategies' `avg_type` to its
+indicator, and `moving_average` computes the same line over a whole close
+series for the sweeps that run without Cerebro.
+"""
+
+
+@njit(cache=True)
+def rolling_mean_std(values, period):
+    """
+    Rolling mean and population standard deviation (NaN until `period` values),
+    from a running sum and sum of squares of the window.
+
+    The values are summed relative to the first one so the sums stay small, and
+    every `period` bars the window is re-summed from scratch so rounding errors
+    can't build up over long histories. (Differences of plain cumulative sums
+    over the whole feed would be O(N) too, but on ~100k bars of raw prices the
+    `sumsq / period - mean ** 2` cancellation makes the std ~100x less precise.)
+    """
+    n = values.size
+    mean = np.full(n, np.nan)
+    std = np.full(n, np.nan)
+    if n == 0:
+        return mean, std
+
+    ref = values[0]
+    s = 0.0
+    s2 = 0.0
+    for i in range(n):
+        d = values[i] - ref
+        s += d
+        s2 += d * d
+        if i >= period:
+            old = values[i - period] - ref
+            s -= old
+            s2 -= old * old
+        if (i + 1) % period == 0:
+            s = 0.0
+            s2 = 0.0
+            for j in range(i - period + 1, i + 1):
+                d = values[j] - ref
+                s += d
+                s2 += d * d
+        if i >= period - 1:
+            m = s / period
+            var = s2 / period - m * m
+            mean[i] = ref + m
+            std[i] = math.sqrt(var) if var > 0.0 else 0.0
+    return mean, std
+
+
+@njit(cache=True)
+def rolling_mean(values, period):
+    """
+    Rolling mean (NaN until `period` values), the mean half of `rolling_mean_std`
+    with the same relative running sum and periodic re-summing.
+    """
+    n = values.size
+    mean = np.full(n, np.nan)
+    if n == 0:
+        return mean
+
+    ref = values[0]
+    s = 0.0
+    for i in range(n):
+        s += values[i] - ref
+        if i >= period:
+            s -= values[i - period] - ref
+        if (i + 1) % period == 0:
+            s = 0.0
+            for j in range(i - period + 1, i + 1):
+                s += values[j] - ref
+        if i >= period - 1:
+            mean[i] = ref + s / period
+    return mean
+
+
+class OnlineBollinger(bt.Indicator):
+    """
+    Bollinger bands with separate multipliers for the lower and upper band:
+      - sma = SimpleMovingAverage(data, period)
+      - lower = sma - std * lower_dev
+      - upper = sma + std * upper_dev
+    with std the population StandardDeviation(data, period), like Backtrader's
+    (not kept as a line of its own).
+    """
+
+    lines = ('sma', 'lower', 'upper')
+    params = (
+        ('period', 20),
+        ('lower_dev', 2.0),
+        ('upper_dev', 2.0),
+    )
+    plotinfo = dict(subplot=False)
+
+    def __init__(self):
+        self.addminperiod(self.p.period)
+        # Bar-by-bar state: the window (relative to the first value) and its running sums
+        self._window = collections.deque(maxlen=self.p.period)
+        self._ref = None
+        self._sum = 0.0
+        self._sumsq = 0.0
+        self._count = 0
+
+    def _push(self, value):
+        if self._ref is None:
+            self._ref = value
+        d = value - self._ref
+        old = self._window[0] if len(self._window) == self.p.period else None
+        self._window.append(d)
+        self._sum += d
+        self._sumsq += d * d
+        if old is not None:
+            self._sum -= old
+            self._sumsq -= old * old
+        self._count += 1
+        if self._count % self.p.period == 0:
+            # Re-sum the window now and then so rounding errors can't build up
+            # (same summation order as rolling_mean_std, so both paths agree exactly)
+            self._sum = sum(self._window)
+            self._sumsq = sum(v * v for v in self._window)
+
+    def prenext(self):
+        self._push(self.data[0])
+
+    def next(self):
+        self._push(self.data[0])
+        period = self.p.period
+        m = self._sum / period
+        var = self._sumsq / period - m * m
+        std = math.sqrt(var) if var > 0.0 else 0.0
+        sma = self._ref + m
+        self.lines.sma[0] = sma
+        self.lines.lower[0] = sma - std * self.p.lower_dev
+        self.lines.upper[0] = sma + std * self.p.upper_dev
+
+    def once(self, start, end):
+        # The whole preloaded history is available: compute every bar in one compiled pass
+        values = np.asarray(self.data.array[:end], dtype=np.float64)
+        sma, std = rolling_mean_std(values, self.p.period)
+        lines = (
+            (self.lines.sma, sma),
+            (self.lines.lower, sma - std * self.p.lower_dev),
+            (self.lines.upper, sma + std * self.p.upper_dev),
+        )
+        for line, values in lines:
+            line.array[start:end] = array('d', values[start:end])
+
+
+class NumbaSMA(bt.Indicator):
+    """
+    Simple moving average of the last `period` values, as Backtrader's
+    SimpleMovingAverage, from a running sum of the window instead of
+    re-summing it on every bar.
+    """
+
+    lines = ('sma',)
+    params = (('period', 30),)
+    plotinfo = dict(subplot=False)
+
+    def __init__(self):
+        self.addminperiod(self.p.period)
+        # Bar-by-bar state: the window (relative to the first value) and its running sum
+        self._window = collections.deque(maxlen=self.p.period)
+        self._ref = None
+        self._sum = 0.0
+        self._count = 0
+
+    def _push(self, value):
+        if self._ref is None:
+            self._ref = value
+        d = value - self._ref
+        old = self._window[0] if len(self._window) == self.p.period else None
+        self._window.append(d)
+        self._sum += d
+        if old is not None:
+            self._sum -= old
+        self._count += 1
+        if self._count % self.p.period == 0:
+            self._sum = sum(self._window)  # as rolling_mean does, so both paths agree exactly
+
+    def prenext(self):
+        self._push(self.data[0])
+
+    def next(self):
+        self._push(self.data[0])
+        self.lines.sma[0] = self._ref + self._sum / self.p.period
+
+    def once(self, start, end):
+        values = np.asarray(self.data.array[:end], dtype=np.float64)
+        sma = rolling_mean(values, self.p.period)
+        self.lines.sma.array[start:end] = array('d', sma[start:end])
+
+
+class NumbaEMA(bt.Indicator):
+    """
+    Exponential moving average, as Backtrader's ExponentialMovingAverage:
+      - seed: SMA of the first `period` values
+      - ema = prev * (1 - alpha) + data * alpha, with alpha = 2 / (period + 1)
+    """
+
+    lines = ('ema',)
+    params = (('period', 30),)
+    plotinfo = dict(subplot=False)
+
+    def __init__(self):
+        self.addminperiod(self.p.period)
+        self.alpha = 2.0 / (1.0 + self.p.period)
+        self.alpha1 = 1.0 - self.alpha
+
+    def nextstart(self):
+        self.lines.ema[0] = math.fsum(self.data.get(size=self.p.period)) / self.p.period
+
+    def next(self):
+        self.lines.ema[0] = self.lines.ema[-1] * self.alpha1 + self.data[0] * self.alpha
+
+    def oncestart(self, start, end):
+        darray = self.data.array
+        self.lines.ema.array[start] = math.fsum(darray[start - self.p.period + 1:start + 1]) / self.p.period
+
+    def once(self, start, end):
+        # Smooth on from the seed oncestart() left on the previous bar, in one compiled pass
+        values = np.asarray(self.data.array[:end], dtype=np.float64)
+        ema = _seeded_smoothing(values, self.alpha, self.p.period, self.lines.ema.array[start - 1], start)
+        self.lines.ema.array[start:end] = array('d', ema[start:end])
+
+
+# Moving average indicator for each `avg_type` (the same `sma_period` applies to all of them)
+MOVING_AVERAGES = {
+    'SMA': NumbaSMA,
+    'EMA': NumbaEMA,
+    'WMA': bt.indicators.WeightedMovingAverage,
+}
+
+
+def moving_average(close, avg_type, period):
+    """Backtrader SMA / EMA / WMA of `close` (NaN until `period` bars are available)."""
+    avg_type = avg_type.upper()
+    if avg_type == 'SMA':
+        return close.rolling(period).mean().to_numpy()
+    elif avg_type == 'EMA':
+        return ema(close, period).to_numpy()
+    elif avg_type == 'WMA':
+        weights = np.arange(1, period + 1, dtype=np.float64)
+        out = np.full(len(close), np.nan)
+        out[period - 1:] = sliding_window_view(close.to_numpy(dtype=np.float64), period) @ (weights / weights.sum())
+        return out
+    raise ValueError(f"Unknown avg_type: {avg_type}")
+
+
+@njit(cache=True)
+def laguerre_rsi(values, gamma, start):
+    """
+    Ehlers' Laguerre RSI of `values` (NaN before bar `start`), with the four
+    filter stages starting from 0 on bar `start`, as Backtrader's LaguerreRSI.
+    """
+    n = values.size
+    lrsi = np.full(n, np.nan)
+    l0 = l1 = l2 = l3 = 0.0
+    for i in range(start, n):
+        l0_1, l1_1, l2_1 = l0, l1, l2
+        l0 = (1.0 - gamma) * values[i] + gamma * l0_1
+        l1 = -gamma * l0 + l0_1 + gamma * l1_1
+        l2 = -gamma * l1 + l1_1 + gamma * l2_1
+        l3 = -gamma * l2 + l2_1 + gamma * l3
+
+        cu = 0.0
+        cd = 0.0
+        if l0 >= l1:
+            cu = l0 - l1
+        else:
+            cd = l1 - l0
+        if l1 >= l2:
+            cu += l1 - l2
+        else:
+            cd += l2 - l1
+        if l2 >= l3:
+            cu += l2 - l3
+        else:
+            cd += l3 - l2
+
+        den = cu + cd
+        lrsi[i] = 1.0 if den == 0.0 else cu / den
+    return lrsi
+
+
+class NumbaLaguerreRSI(bt.Indicator):
+    """
+    Laguerre RSI, as Backtrader's LaguerreRSI (gamma between 0.2 and 0.8,
+    the filter starting on the bar `period` reaches).
+    """
+
+    alias = ('NumbaLRSI',)
+    lines = ('lrsi',)
+    params = (
+        ('gamma', 0.5),
+        ('period', 6),
+    )
+    plotinfo = dict(
+        plotymargin=0.15,
+        plotyticks=[0.0, 0.2, 0.5, 0.8, 1.0]
+    )
+
+    def __init__(self):
+        self.addminperiod(self.p.period)
+        self.l0 = self.l1 = self.l2 = self.l3 = 0.0
+
+    def next(self):
+        l0_1, l1_1, l2_1 = self.l0, self.l1, self.l2
+        g = self.p.gamma
+        self.l0 = l0 = (1.0 - g) * self.data[0] + g * l0_1
+        self.l1 = l1 = -g * l0 + l0_1 + g * l1_1
+        self.l2 = l2 = -g * l1 + l1_1 + g * l2_1
+        self.l3 = l3 = -g * l2 + l2_1 + g * self.l3
+
+        cu = cd = 0.0
+        if l0 >= l1:
+            cu = l0 - l1
+        else:
+            cd = l1 - l0
+        if l1 >= l2:
+            cu += l1 - l2
+        else:
+            cd += l2 - l1
+        if l2 >= l3:
+            cu += l2 - l3
+        else:
+            cd += l3 - l2
+
+        den = cu + cd
+        self.lines.lrsi[0] = 1.0 if not den else cu / den
+
+    def oncestart(self, start, end):
+        pass  # the filter's first bar is computed by once(), with all the others
+
+    def once(self, start, end):
+        # The filter starts on the bar oncestart() was given (start - 1); run it to the
+        # end of the preloaded feed in one compiled pass
+        values = np.asarray(self.data.array[:end], dtype=np.float64)
+        lrsi = laguerre_rsi(values, self.p.gamma, start - 1)
+        self.lines.lrsi.array[start - 1:end] = array('d', lrsi[start - 1:end])
@@ -0,0 +1,50 @@
+import sys
+import logging
+
+"""
+Colored log output for the strategies that log through `logging`.
+
+A strategy passes the color with the record (`extra={'color': GREEN}`) and
+`ColorFormatter` wraps the message in it when the record is actually written,
+so nothing is built for records that are filtered out. Whether to color at
+all is decided once, from the handler's stream: escape codes are left out
+when it isn't a terminal, e.g. when it is redirected to a file.
+
+The scripts and strategies that print() instead use the `PRINT_*` codes,
+which are empty when stdout isn't a terminal.
+"""
+
+# ANSI color codes
+GREEN = '\033[0;32m'
+RED = '\033[0;31m'
+YELLOW = '\033[0;33m'
+RESET = '\033[0m'
+
+# The same codes for print(); left out when stdout isn't a terminal, e.g. when it is redirected to a file
+_TTY = sys.stdout.isatty()
+PRINT_GREEN = GREEN if _TTY else ''
+PRINT_RED = RED if _TTY else ''
+PRINT_YELLOW = YELLOW if _TTY else ''
+PRINT_RESET = RESET if _TTY else ''
+
+
+class ColorFormatter(logging.Formatter):
+    """Formatter that wraps the message of records with a `color` attribute in that color."""
+
+    def __init__(self, fmt=None, datefmt=None, stream=None):
+        super().__init__(fmt, datefmt)
+        self.use_color = stream is not None and stream.isatty()
+
+    def formatMessage(self, record):
+        color = getattr(record, 'color', None)
+        if color and self.use_color:
+            # record.message is rebuilt by every format() call, so other handlers still get plain text
+            record.message = f"{color}{record.message}{RESET}"
+        return super().formatMessage(record)
+
+
+def color_handler(fmt):
+    """Stream handler on stderr (like `logging.basicConfig`'s) with a `ColorFormatter` for `fmt`."""
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(ColorFormatter(fmt, stream=handler.stream))
+    return handler
@@ -0,0 +1,110 @@
+import itertools
+import numpy as np
+import pandas as pd
+from numba import njit, prange
+from lib.broker_cash import buy_cash, sell_cash
+from lib.indicators import moving_average
+
+"""
+Parameter sweep for `market_average_with_stop_loss` without Cerebro.
+
+In a backtest the strategy is a simple scan over the close prices and its
+moving average, so instead of running one Backtrader optimisation pass per
+parameter combination, a Numba kernel replays the same rules on the
+preloaded arrays for every combination in parallel:
+
+- flat: buy (cash / close) * 0.95 when close <= MA * (1 - buy_threshold)
+- long: sell everything when close <= entry * (1 - stop_loss) or
+  close >= entry * (1 + sell_threshold)
+- market orders fill at the next bar's open, paying `commission` on the
+  traded value; a buy the cash can't cover, at the creation close or at the
+  filling open, is refused (Backtrader's default broker with `setcommission`)
+
+The moving averages are computed once per (avg_type, period) and shared by
+every combination that uses them. Only the search runs here; the winning
+parameters should still be run through Cerebro for the logged/plotted result.
+"""
+
+
+@njit(cache=True, parallel=True)
+def _sweep(open_, close, ma, ma_row, buy_thresholds, sell_thresholds, stop_losses, cash0, commission):
+    """Final portfolio value of every combination k (moving average row `ma_row[k]`)."""
+    n_bars = close.size
+    final_values = np.empty(ma_row.size)
+    for k in prange(ma_row.size):
+        ma_k = ma[ma_row[k]]
+        buy_factor = 1 - buy_thresholds[k]
+        sell_factor = 1 + sell_thresholds[k]
+        stop_factor = 1 - stop_losses[k]
+
+        cash = cash0
+        size = 0.0        # position size, 0 = flat
+        entry = 0.0       # position price
+        pending = 0       # +1 buy / -1 sell market order waiting for the next open
+        order_size = 0.0
+        for i in range(n_bars):
+            # Orders from the previous bar fill at this bar's open, before next() runs
+            if pending == 1:
+                if (buy_cash(cash, order_size, close[i - 1], commission) >= 0.0
+                        and buy_cash(cash, order_size, open_[i], commission) >= 0.0):
+                    cash = buy_cash(cash, order_size, open_[i], commission)
+                    size = order_size
+                    entry = open_[i]
+            elif pending == -1:
+                cash = sell_cash(cash, size, entry, open_[i], commission)
+                size = 0.0
+            pending = 0
+
+            if np.isnan(ma_k[i]):
+                continue  # moving average still warming up
+            c = close[i]
+            if size == 0.0:
+                if c <= ma_k[i] * buy_factor:
+                    order_size = (cash / c) * 0.95
+                    pending = 1
+            elif c <= entry * stop_factor or c >= entry * sell_factor:
+                pending = -1
+
+        final_values[k] = cash + size * close[n_bars - 1]
+    return final_values
+
+
+def sweep(
+    data: pd.DataFrame,
+    avg_types=('EMA',),
+    sma_periods=(600,),
+    buy_thresholds=(0.03,),
+    sell_thresholds=(0.07,),
+    stop_losses=(0.05,),
+    cash: float = 100.0,
+    commission: float = 0.001
+) -> pd.DataFrame:
+    """
+    Backtest every combination of the given parameter lists.
+
+    :param data: OHLCV DataFrame of the backtest window (as from `load_price_data`)
+    :param cash: Starting cash
+    :param commission: Broker commission rate
+    :return: One row per combination with its parameters and `final_value`, best first
+    """
+    close = data['close'].astype(np.float64)
+    ma_keys = list(itertools.product(avg_types, sma_periods))
+    ma = np.vstack([moving_average(close, avg_type, period) for avg_type, period in ma_keys])
+
+    combos = pd.DataFrame(
+        list(itertools.product(range(len(ma_keys)), buy_thresholds, sell_thresholds, stop_losses)),
+        columns=['ma_row', 'buy_threshold', 'sell_threshold', 'stop_loss'],
+    )
+    final_values = _sweep(
+        data['open'].to_numpy(dtype=np.float64), close.to_numpy(), ma,
+        combos['ma_row'].to_numpy(dtype=np.int64),
+        combos['buy_threshold'].to_numpy(dtype=np.float64),
+        combos['sell_threshold'].to_numpy(dtype=np.float64),
+        combos['stop_loss'].to_numpy(dtype=np.float64),
+        cash, commission,
+    )
+
+    ma_params = pd.DataFrame(ma_keys, columns=['avg_type', 'sma_period'])
+    results = ma_params.iloc[combos.pop('ma_row')].reset_index(drop=True).join(combos)
+    results['final_value'] = final_values
+    return results.sort_values('final_value', ascending=False, kind='stable', ignore_index=True)
@@ -0,0 +1,112 @@
+import itertools
+import numpy as np
+import pandas as pd
+from numba import njit, prange
+from lib.indicators import rolling_mean_std
+from lib.broker_cash import buy_cash, sell_cash, fill_price
+
+"""
+Parameter sweep for `BollingerTrailingStopStrategy` without Cerebro.
+
+The strategy is a small state machine over the close prices and its lower
+Bollinger band, so instead of one Backtrader optimisation pass per parameter
+combination, a Numba kernel runs the same rules on the preloaded arrays for
+every combination in parallel:
+
+- flat: buy `stake` units when close < SMA - std * dev_factor
+- long: sell them when close <= (highest price since entry) * (1 - trail_percent),
+  the highest price starting from the fill price
+- market orders fill at the next bar's open, paying `commission` on the
+  traded value; a buy the cash can't cover is refused (Backtrader's default
+  broker with `setcommission` and the default fixed-size sizer)
+
+The rolling mean/std are computed once per period (with the same kernel as
+the strategy's OnlineBollinger indicator) and shared by every combination
+that uses them. Only the search runs here; the winning parameters should
+still be run through Cerebro for the logged/plotted result.
+"""
+
+
+@njit(cache=True, parallel=True)
+def _sweep(open_, close, mean, std, stats_row, dev_factors, trail_percents, cash0, commission, stake):
+    """Final portfolio value of every combination k (rolling mean/std row `stats_row[k]`)."""
+    n_bars = close.size
+    final_values = np.empty(stats_row.size)
+    for k in prange(stats_row.size):
+        mean_k = mean[stats_row[k]]
+        std_k = std[stats_row[k]]
+        dev_factor = dev_factors[k]
+        trail_factor = 1 - trail_percents[k]
+
+        cash = cash0
+        size = 0.0       # position size, 0 = flat
+        entry = 0.0      # position price
+        max_price = 0.0  # highest price since entry
+        pending = 0      # +1 buy / -1 sell market order waiting for the next open
+        for i in range(n_bars):
+            # Orders from the previous bar fill at this bar's open, before next() runs
+            if pending == 1:
+                if (buy_cash(cash, stake, close[i - 1], commission) >= 0.0
+                        and buy_cash(cash, stake, open_[i], commission) >= 0.0):
+                    cash = buy_cash(cash, stake, open_[i], commission)
+                    size = stake
+                    entry = open_[i]
+                    max_price = fill_price(stake, entry)
+            elif pending == -1:
+                cash = sell_cash(cash, size, entry, open_[i], commission)
+                size = 0.0
+            pending = 0
+
+            if np.isnan(mean_k[i]):
+                continue  # bands still warming up
+            c = close[i]
+            if size == 0.0:
+                if c < mean_k[i] - std_k[i] * dev_factor:
+                    pending = 1
+            else:
+                max_price = max(max_price, c)
+                if c <= max_price * trail_factor:
+                    pending = -1
+
+        final_values[k] = cash + size * close[n_bars - 1]
+    return final_values
+
+
+def sweep(
+    data: pd.DataFrame,
+    periods=(20,),
+    dev_factors=(2.0,),
+    trail_percents=(0.1,),
+    cash: float = 100.0,
+    commission: float = 0.001,
+    stake: float = 1.0
+) -> pd.DataFrame:
+    """
+    Backtest every combination of the given parameter lists.
+
+    :param data: OHLCV DataFrame of the backtest window (as from `load_price_data`)
+    :param cash: Starting cash
+    :param commission: Broker commission rate
+    :param stake: Units bought per trade (the sizer's stake)
+    :return: One row per combination with its parameters and `final_value`, best first
+    """
+    close = data['close'].to_numpy(dtype=np.float64)
+    stats = [rolling_mean_std(close, period) for period in periods]
+    mean = np.vstack([m for m, _ in stats])
+    std = np.vstack([s for _, s in stats])
+
+    combos = pd.DataFrame(
+        list(itertools.product(range(len(periods)), dev_factors, trail_percents)),
+        columns=['stats_row', 'dev_factor', 'trail_percent'],
+    )
+    final_values = _sweep(
+        data['open'].to_numpy(dtype=np.float64), close, mean, std,
+        combos['stats_row'].to_numpy(dtype=np.int64),
+        combos['dev_factor'].to_numpy(dtype=np.float64),
+        combos['trail_percent'].to_numpy(dtype=np.float64),
+        cash, commission, float(stake),
+    )
+
+    results = pd.DataFrame({'period': np.asarray(periods)[combos.pop('stats_row')]}).join(combos)
+    results['final_value'] = final_values
+    return results.sort_values('final_value', ascending=False, kind='stable', ignore_index=True)
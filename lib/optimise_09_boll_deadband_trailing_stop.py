@@ -0,0 +1,124 @@
+import itertools
+import numpy as np
+import pandas as pd
+from numba import njit, prange
+from lib.indicators import rolling_mean_std
+from lib.broker_cash import buy_cash, sell_cash, fill_price
+
+"""
+Parameter sweep for `BollingerDeadbandStopTrail` without Cerebro.
+
+Like the strategy 08 sweep, a Numba kernel runs the strategy's rules on the
+preloaded arrays for every parameter combination in parallel:
+
+- flat: buy cash * 0.95 / close when close <= SMA - std * dev_factor
+- long: sell when close <= entry * (1 - stop_loss); above entry * (1 + deadband)
+  track the highest close (from the entry on) and sell when close drops below
+  (1 - trailing_stop_percent) of it; in between do nothing
+- market orders fill at the next bar's open, paying `commission` on the
+  traded value; a buy the cash can't cover is refused (Backtrader's default
+  broker with `setcommission`)
+
+Only the Bollinger period needs its own rolling mean/std (with the same kernel
+as the strategy's OnlineBollinger indicator); every dev_factor / stop_loss /
+deadband / trailing_stop_percent combination on that period reuses them. Only
+the search runs here; the winning parameters should still be run through
+Cerebro for the logged/plotted result.
+"""
+
+
+@njit(cache=True, parallel=True)
+def _sweep(open_, close, mean, std, stats_row, dev_factors, stop_losses, deadbands, trail_percents,
+           cash0, commission):
+    """Final portfolio value of every combination k (rolling mean/std row `stats_row[k]`)."""
+    n_bars = close.size
+    final_values = np.empty(stats_row.size)
+    for k in prange(stats_row.size):
+        mean_k = mean[stats_row[k]]
+        std_k = std[stats_row[k]]
+        dev_factor = dev_factors[k]
+        stop_factor = 1 - stop_losses[k]
+        deadband_factor = 1 + deadbands[k]
+        trail_factor = 1 - trail_percents[k]
+
+        cash = cash0
+        size = 0.0        # position size, 0 = flat
+        entry = 0.0       # position price
+        fill = 0.0        # the buy's executed price, which the strategy's levels use
+        max_price = 0.0   # highest close above the deadband since entry
+        pending = 0       # +1 buy / -1 sell market order waiting for the next open
+        order_size = 0.0
+        for i in range(n_bars):
+            # Orders from the previous bar fill at this bar's open, before next() runs
+            if pending == 1:
+                if (buy_cash(cash, order_size, close[i - 1], commission) >= 0.0
+                        and buy_cash(cash, order_size, open_[i], commission) >= 0.0):
+                    cash = buy_cash(cash, order_size, open_[i], commission)
+                    size = order_size
+                    entry = open_[i]
+                    fill = fill_price(order_size, entry)
+                    max_price = fill
+            elif pending == -1:
+                cash = sell_cash(cash, size, entry, open_[i], commission)
+                size = 0.0
+            pending = 0
+
+            if np.isnan(mean_k[i]):
+                continue  # bands still warming up
+            c = close[i]
+            if size == 0.0:
+                if c <= mean_k[i] - std_k[i] * dev_factor:
+                    order_size = cash * 0.95 / c
+                    pending = 1
+            elif c <= fill * stop_factor:
+                pending = -1
+            elif c > fill * deadband_factor:
+                max_price = max(max_price, c)
+                if c < max_price * trail_factor:
+                    pending = -1
+
+        final_values[k] = cash + size * close[n_bars - 1]
+    return final_values
+
+
+def sweep(
+    data: pd.DataFrame,
+    periods=(25,),
+    dev_factors=(1.6,),
+    deadbands=(0.0,),
+    stop_losses=(0.07,),
+    trailing_stop_percents=(0.13,),
+    cash: float = 100.0,
+    commission: float = 0.001
+) -> pd.DataFrame:
+    """
+    Backtest every combination of the given parameter lists.
+
+    :param data: OHLCV DataFrame of the backtest window (as from `load_price_data`)
+    :param cash: Starting cash
+    :param commission: Broker commission rate
+    :return: One row per combination with its parameters and `final_value`, best first
+    """
+    close = data['close'].to_numpy(dtype=np.float64)
+    stats = [rolling_mean_std(close, period) for period in periods]
+    mean = np.vstack([m for m, _ in stats])
+    std = np.vstack([s for _, s in stats])
+
+    combos = pd.DataFrame(
+        list(itertools.product(range(len(periods)), dev_factors, deadbands, stop_losses,
+                               trailing_stop_percents)),
+        columns=['stats_row', 'dev_factor', 'deadband', 'stop_loss', 'trailing_stop_percent'],
+    )
+    final_values = _sweep(
+        data['open'].to_numpy(dtype=np.float64), close, mean, std,
+        combos['stats_row'].to_numpy(dtype=np.int64),
+        combos['dev_factor'].to_numpy(dtype=np.float64),
+        combos['stop_loss'].to_numpy(dtype=np.float64),
+        combos['deadband'].to_numpy(dtype=np.float64),
+        combos['trailing_stop_percent'].to_numpy(dtype=np.float64),
+        cash, commission,
+    )
+
+    results = pd.DataFrame({'period': np.asarray(periods)[combos.pop('stats_row')]}).join(combos)
+    results['final_value'] = final_values
+    return results.sort_values('final_value', ascending=False, kind='stable', ignore_index=True)
@@ -0,0 +1,148 @@
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import backtrader as bt
+from lib.scenario_XRPUSDT import create_cerebro_with_warmup
+
+"""
+Grid search over a strategy's parameters, one Cerebro backtest per
+combination spread over a pool of worker processes.
+
+`cerebro.optstrategy` runs the combinations in Backtrader's own pool, but with
+`optreturn=False` every finished strategy (indicators, line buffers and all)
+is pickled back to the parent just to read its final value. Here each worker
+builds its own Cerebro with `create_cerebro_with_warmup`, runs one
+combination and returns only the broker value, without the standard
+observers (broker cash/value, buy/sell marks, trade PnL) that would otherwise
+record a value per bar for a plot that is never drawn. The price history is loaded
+once per worker process (it is cached by `create_cerebro_with_warmup`), and
+with fork-started workers it is inherited from the parent's cache instead,
+like the compiled indicator/signal kernels.
+
+`coarse_to_fine` searches a larger space with fewer backtests: it runs a
+coarse grid, then a finer grid around the winner (halfway to its neighbouring
+values), and so on for a few rounds, instead of one full grid at the finest
+spacing.
+
+Both can abandon combinations that are clearly losing: with `stop_below`,
+a backtest stops as soon as its broker value drops under that fraction of
+the starting cash, and reports the value it had then (a low score either way).
+
+Strategies without a compiled sweep (see the `optimise_0N_*` modules)
+use this; the scripts calling it need an `if __name__ == '__main__':` guard so
+spawn-started workers don't re-run them.
+"""
+
+
+class _StopBelow(bt.Analyzer):
+    """Stops the backtest once the broker value falls below `fraction` of the starting cash."""
+
+    params = (('fraction', 0.5),)
+
+    def start(self):
+        self._floor = self.strategy.broker.startingcash * self.p.fraction
+
+    def notify_cashvalue(self, cash, value):
+        if value < self._floor:
+            self.strategy.env.runstop()
+
+
+def _run_one(job):
+    """
+    Final broker value of one backtest: (strategy class, params dict, cerebro kwargs,
+    stop_below fraction or None).
+    """
+    strategy, params, cerebro_kwargs, stop_below = job
+    cerebro = create_cerebro_with_warmup(**cerebro_kwargs)
+    cerebro.addstrategy(strategy, **params)
+    if stop_below is not None:
+        cerebro.addanalyzer(_StopBelow, fraction=stop_below)
+    cerebro.run(preload=True, runonce=True, stdstats=False)
+    return cerebro.broker.getvalue()
+
+
+def run_grid(strategy, grid: dict, processes: int = None, stop_below: float = None,
+             **cerebro_kwargs) -> pd.DataFrame:
+    """
+    Backtest `strategy` for every combination of the parameter lists in `grid`.
+
+    :param strategy: bt.Strategy subclass (importable at module level, for pickling)
+    :param grid: Parameter name -> list of values to try
+    :param processes: Worker processes (None = one per CPU)
+    :param stop_below: Stop a backtest early once its value is under this fraction of
+        the starting cash, e.g. 0.5 (None = always run to the end)
+    :param cerebro_kwargs: Passed to `create_cerebro_with_warmup` (dates, cash, commission, ...)
+    :return: One row per combination with its parameters and `final_value`, best first
+    """
+    names = list(grid)
+    combos = [dict(zip(names, values)) for values in itertools.product(*grid.values())]
+    return _run_combos(strategy, names, combos, processes, stop_below, cerebro_kwargs)
+
+
+def _run_combos(strategy, names, combos, processes, stop_below, cerebro_kwargs):
+    jobs = [(strategy, params, cerebro_kwargs, stop_below) for params in combos]
+    # Run the first combination in the parent: that loads the prices and compiles the
+    # strategy's Numba kernels once, so fork-started workers inherit both, and
+    # spawn-started ones load the kernels from Numba's on-disk cache instead of each
+    # compiling them again
+    final_values = [_run_one(jobs[0])] if jobs else []
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        final_values += pool.map(_run_one, jobs[1:])
+
+    results = pd.DataFrame(combos, columns=names)
+    results['final_value'] = final_values
+    return results.sort_values('final_value', ascending=False, kind='stable', ignore_index=True)
+
+
+def _neighbourhood(values, best, points):
+    """
+    `points` evenly spaced values over the part of the range closer to `best`
+    than to any other grid value, i.e. halfway to its neighbours (integers stay
+    integers); just `best` for a parameter with a single value or a
+    non-numeric one (flags, names).
+    """
+    if len(values) < 2 or isinstance(best, (bool, str)):
+        return [best]
+    values = sorted(set(values))
+    i = values.index(best)
+    lo = (values[i - 1] + best) / 2 if i > 0 else best
+    hi = (best + values[i + 1]) / 2 if i < len(values) - 1 else best
+    fine = np.linspace(lo, hi, points).tolist()
+    if all(isinstance(v, int) for v in values):
+        fine = [int(round(v)) for v in fine]
+    return sorted(set(fine) | {best})
+
+
+def coarse_to_fine(strategy, grid: dict, rounds: int = 2, points: int = 5, processes: int = None,
+                   stop_below: float = None, **cerebro_kwargs) -> pd.DataFrame:
+    """
+    Grid search that zooms in on the best result: after backtesting `grid`,
+    each following round tries `points` values per numeric parameter around
+    the best value, reaching halfway to its neighbours in the previous round's
+    grid (combinations already run are not repeated).
+
+    :param strategy: bt.Strategy subclass (importable at module level, for pickling)
+    :param grid: Parameter name -> list of values for the coarse first round
+    :param rounds: Number of rounds, including the coarse one
+    :param points: Values per parameter in each finer round
+    :param processes: Worker processes (None = one per CPU)
+    :param stop_below: Fraction of the starting cash to stop losing backtests at (see `run_grid`)
+    :param cerebro_kwargs: Passed to `create_cerebro_with_warmup` (dates, cash, commission, ...)
+    :return: Every combination run, with its parameters and `final_value`, best first
+    """
+    names = list(grid)
+    results = run_grid(strategy, grid, processes, stop_below, **cerebro_kwargs)
+    for _ in range(rounds - 1):
+        best = results[names].iloc[:1].to_dict('records')[0]
+        grid = {name: _neighbourhood(grid[name], best[name], points) for name in names}
+
+        done = set(results[names].itertuples(index=False, name=None))
+        combos = [dict(zip(names, values)) for values in itertools.product(*grid.values())
+                  if values not in done]
+        if not combos:
+            break
+        new = _run_combos(strategy, names, combos, processes, stop_below, cerebro_kwargs)
+        results = pd.concat([results, new], ignore_index=True).sort_values(
+            'final_value', ascending=False, kind='stable', ignore_index=True)
+    return results
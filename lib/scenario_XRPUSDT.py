@@ -1,9 +1,147 @@
 import os
 import glob
+import functools
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
 import backtrader as bt
+from backtrader.utils import date2num
 from datetime import datetime, timedelta
 
+# Columns stored in the downloaded Parquet files
+PRICE_COLUMNS = ['ts_ms', 'open', 'high', 'low', 'close', 'volume', 'openinterest']
+
+def convert_csvs_to_parquet(folder: str = "downloaded_coin_data/XRPUSDT_1m") -> list:
+    """
+    One-time conversion of older monthly CSV downloads (YYYY_MM.csv) into zstd Parquet
+    files next to them (YYYY_MM.parquet) with the same columns the downloader writes.
+    CSVs that already have a Parquet copy are left alone.
+
+    :param folder: Folder containing the monthly CSV files
+    :return: Paths of the Parquet files written
+    """
+    written = []
+    for csv_file in sorted(glob.glob(os.path.join(folder, "*.csv"))):
+        parquet_file = os.path.splitext(csv_file)[0] + ".parquet"
+        if os.path.exists(parquet_file):
+            continue
+
+        # Arrow's multithreaded parser reads the timestamps natively (no dateutil)
+        table = pacsv.read_csv(csv_file)
+        # Old files use either Open/High/... or open/high/...; the first column is the bar time
+        table = table.rename_columns([name.lower() for name in table.column_names])
+        ts_ms = table.column(0).cast(pa.timestamp('ms')).cast(pa.int64())
+        columns = [ts_ms] + [table[col].cast(pa.float64()) for col in PRICE_COLUMNS[1:6]]
+        if 'openinterest' in table.column_names:
+            columns.append(table['openinterest'].cast(pa.int64()))
+        else:
+            columns.append(pa.array(np.zeros(len(table), dtype=np.int64)))
+
+        pq.write_table(pa.table(columns, names=PRICE_COLUMNS), parquet_file, compression='zstd')
+        written.append(parquet_file)
+    return written
+
+def load_price_data(
+    folder: str = "downloaded_coin_data/XRPUSDT_1m",
+    start_date: datetime = datetime(2023, 12, 1),
+    end_date: datetime = datetime(2025, 3, 1),
+    warmup_bars: int = 0
+) -> pd.DataFrame:
+    """
+    Reads all monthly Parquet files from `folder` in one dataset scan (older CSV downloads are
+    converted to Parquet on first use, see `convert_csvs_to_parquet`), and slices the data
+    so that we have `warmup_bars` before `start_date`, and extends up to `end_date` if provided.
+
+    :param folder: Folder containing the monthly Parquet partitions (or older CSV) files
+    :param start_date: The main start date for your backtest
+    :param end_date: Optional end date for your backtest (None = up to last data)
+    :param warmup_bars: Number of bars to include before 'start_date' as warmup
+    :return: OHLCV DataFrame indexed by datetime
+    """
+    # 1) Gather monthly files: Parquet partitions (year=YYYY/month=MM/part.parquet,
+    #    or older flat YYYY_MM.parquet), converting any original CSV downloads first
+    convert_csvs_to_parquet(folder)
+    parquet_files = sorted(glob.glob(os.path.join(folder, "**", "*.parquet"), recursive=True))
+    if not parquet_files:
+        raise ValueError(f"No Parquet or CSV files found in folder: {folder}")
+
+    # 2) One multi-file scan: files are decoded in parallel, only the needed columns
+    #    are read and months after end_date are skipped using the row-group stats
+    dataset = ds.dataset(parquet_files, format="parquet")
+    row_filter = None
+    if end_date is not None:
+        end_ms = int(pd.Timestamp(end_date).value // 1_000_000)
+        row_filter = ds.field('ts_ms') <= end_ms
+    data = dataset.to_table(columns=PRICE_COLUMNS, filter=row_filter).to_pandas()
+    # Open time is stored as epoch milliseconds, convert on the int64 fast path
+    data.index = pd.to_datetime(data.pop('ts_ms').to_numpy(), unit='ms')
+    data.index.name = 'datetime'
+
+    # Only pay for the sort / de-duplication passes when they're actually needed
+    if not data.index.is_monotonic_increasing:
+        data.sort_index(inplace=True)
+    # Older downloads weren't calendar-month aligned and can overlap newer months
+    if data.index.has_duplicates:
+        data = data[~data.index.duplicated(keep='last')]
+
+    # 3) Locate start_date in the sorted index (the bar at start_date, or the first one
+    #    after it). We'll go warmup_bars prior to that index (or 0 if not enough)
+    start_loc = data.index.searchsorted(np.datetime64(start_date), side='left')
+    warmup_start_loc = max(0, start_loc - warmup_bars)
+
+    # 4) Slice the DataFrame to include [warmup_start_loc : end_date]
+    #    (bars after end_date were already filtered out by the scan)
+    return data.iloc[warmup_start_loc:].copy()
+
+class ArrayPandasData(bt.feeds.PandasData):
+    """
+    `bt.feeds.PandasData` that converts the DataFrame's columns (and the bar times, to
+    Backtrader's float days) to plain lists once when the feed starts, so loading a bar
+    is a few list lookups instead of a `DataFrame.iloc` call per column plus a datetime
+    conversion. Same parameters and same values as PandasData.
+    """
+
+    def start(self):
+        super().start()
+        df = self.p.dataname
+        self._columns = []
+        for datafield in self.getlinealiases():
+            if datafield == 'datetime':
+                continue
+            colindex = self._colmapping[datafield]
+            if colindex is None:
+                continue  # column not in the DataFrame
+            values = df.iloc[:, colindex].to_numpy(dtype=np.float64).tolist()
+            self._columns.append((getattr(self.lines, datafield), values))
+
+        coldtime = self._colmapping['datetime']
+        tstamps = df.index if coldtime is None else pd.DatetimeIndex(df.iloc[:, coldtime])
+        self._dtnums = [date2num(dt) for dt in tstamps.to_pydatetime()]
+        self._nrows = len(df)
+
+    def _load(self):
+        self._idx += 1
+        if self._idx >= self._nrows:
+            return False  # exhausted all rows
+
+        i = self._idx
+        for line, values in self._columns:
+            line[0] = values[i]
+        self.lines.datetime[0] = self._dtnums[i]
+        return True
+
+@functools.lru_cache(maxsize=8)
+def _load_sliced_df(folder, start_date, end_date, warmup_bars):
+    """
+    Memoised `load_price_data` for building Cerebro feeds, so the optimisation and final
+    runs of a script (and repeated backtests in one process) only read the files once.
+    The same DataFrame is handed out on every hit: treat it as read-only.
+    """
+    return load_price_data(folder, start_date, end_date, warmup_bars)
+
 def create_cerebro_with_warmup(
     folder: str = "downloaded_coin_data/XRPUSDT_1m",
     start_date: datetime = datetime(2023, 12, 1),
@@ -13,11 +151,10 @@ def create_cerebro_with_warmup(
     commission_rate: float = 0.001
 ) -> bt.Cerebro:
     """
-    Reads all monthly CSVs from `folder`, concatenates them into a single DataFrame,
-    and slices the data so that we have `warmup_bars` before `start_date`, and extends up to `end_date` if provided.
-    Returns a Backtrader 'cerebro' object loaded with this data slice.
-    
-    :param folder: Folder containing monthly CSV files
+    Loads the price history with `load_price_data` (cached per folder/dates/warmup) and
+    returns a fresh Backtrader 'cerebro' object loaded with this data slice.
+
+    :param folder: Folder containing the monthly Parquet (or older CSV) files
     :param start_date: The main start date for your backtest
     :param end_date: Optional end date for your backtest (None = up to last data)
     :param warmup_bars: Number of bars to include before 'start_date' as warmup
@@ -25,45 +162,10 @@ def create_cerebro_with_warmup(
     :param commission_rate: Broker commission rate
     :return: A Backtrader 'cerebro' object ready for backtesting
     """
-    # 1) Gather CSV files
-    csv_files = sorted(glob.glob(os.path.join(folder, "*.csv")))
-    if not csv_files:
-        raise ValueError(f"No CSV files found in folder: {folder}")
-
-    # 2) Read and combine into a single DataFrame
-    dfs = []
-    for file in csv_files:
-        df = pd.read_csv(file, index_col=0, parse_dates=True)
-        # Rename columns to match Backtrader's default naming (if needed)
-        df.rename(columns={
-            'Open': 'open',
-            'High': 'high',
-            'Low': 'low',
-            'Close': 'close',
-            'Volume': 'volume'
-        }, inplace=True)
-        dfs.append(df)
-
-    data = pd.concat(dfs)
-    data.sort_index(inplace=True)
-
-    # 3) Locate start_date in the index
-    #    We'll go warmup_bars prior to that index (or 0 if not enough)
-    if start_date not in data.index:
-        start_loc = data.index.searchsorted(start_date)
-    else:
-        start_loc = data.index.get_loc(start_date)
-    warmup_start_loc = max(0, start_loc - warmup_bars)
-
-    # 4) Slice the DataFrame to include [warmup_start_loc : end_date]
-    if end_date is not None:
-        end_loc = data.index.searchsorted(end_date, side='right')
-        data_sliced = data.iloc[warmup_start_loc:end_loc].copy()
-    else:
-        data_sliced = data.iloc[warmup_start_loc:].copy()
+    data_sliced = _load_sliced_df(folder, start_date, end_date, warmup_bars)
 
-    # 5) Create a PandasData feed
-    bt_feed = bt.feeds.PandasData(
+    # 5) Create a PandasData feed (served from lists, see ArrayPandasData)
+    bt_feed = ArrayPandasData(
         dataname=data_sliced,
         fromdate=start_date,
         todate=end_date
@@ -1,11 +1,10 @@
 import backtrader as bt
 from datetime import datetime
+from lib.indicators import MOVING_AVERAGES
+from lib.log_colors import PRINT_GREEN as GREEN, PRINT_RED as RED, PRINT_YELLOW as YELLOW, PRINT_RESET as RESET
 
-# ANSI color codes for convenience.
-GREEN = '\033[0;32m'
-RED = '\033[0;31m'
-YELLOW = '\033[0;33m'
-RESET = '\033[0m'
+# Status bars are sliced out of one prebuilt dash string instead of multiplying new ones
+BAR_DASHES = '-' * 80
 
 class market_average(bt.Strategy):
     params = (
@@ -21,15 +20,11 @@ class market_average(bt.Strategy):
 
     def __init__(self):
         # Create the moving average indicator.
-        avg_type = self.p.avg_type.upper()
-        if avg_type == 'EMA':
-            self.ma = bt.indicators.ExponentialMovingAverage(self.data.close, period=self.p.sma_period)
-        elif avg_type == 'SMA':
-            self.ma = bt.indicators.SimpleMovingAverage(self.data.close, period=self.p.sma_period)
-        elif avg_type == 'WMA':
-            self.ma = bt.indicators.WeightedMovingAverage(self.data.close, period=self.p.sma_period)
-        else:
-            raise ValueError(f"Unknown avg_type: {self.p.avg_type}")
+        try:
+            moving_average = MOVING_AVERAGES[self.p.avg_type.upper()]
+        except KeyError:
+            raise ValueError(f"Unknown avg_type: {self.p.avg_type}") from None
+        self.ma = moving_average(self.data.close, period=self.p.sma_period)
         self.order = None
 
     def create_status_line(self, buy_val, current, sell_val, state, profit=None, profit_pct=None, width=40):
@@ -54,30 +49,46 @@ class market_average(bt.Strategy):
             ratio = (current - low) / (high - low)
             ratio = max(0, min(1, ratio))
             pos = int(ratio * width)
-        bar = "-" * pos + "*" + "-" * (width - pos)
+        dashes = BAR_DASHES if width <= len(BAR_DASHES) else '-' * width
+        bar = f"{dashes[:pos]}*{dashes[:width - pos]}"
 
         if state == "waiting BUY":
             return f"waiting BUY: {buy_val:.4f} |{bar}| {current:.4f}"
         else:
             return f"waiting SELL: Entry {buy_val:.4f} -> Target {sell_val:.4f} |{bar}| {current:.4f} | P/L: {profit:.4f} ({profit_pct:.2f}%)"
 
+    # Timestamp text of the last bar logged (several lines are often logged per bar)
+    _stamp_num = None
+    _stamp = ''
+
     def log(self, txt, dt=None, color=None):
-        if self.p.printlog:
-            dt = dt or self.datas[0].datetime.datetime(0)
-            if color:
-                txt = f"{color}{txt}{RESET}"
-            print(f"{dt.isoformat()} {txt}")
+        if not self.p.printlog:
+            return
+        if dt is not None:
+            stamp = dt.isoformat()
+        else:
+            bar_num = self.datas[0].datetime[0]
+            if bar_num != self._stamp_num:
+                self._stamp_num = bar_num
+                self._stamp = self.datas[0].datetime.datetime(0).isoformat()
+            stamp = self._stamp
+        if color:
+            txt = f"{color}{txt}{RESET}"
+        print(f"{stamp} {txt}")
 
     def next(self):
         # When not in a position, we're waiting to buy.
         if not self.position:
             # Calculate buy trigger (MA adjusted by buy_threshold).
             trigger = self.ma[0] * (1 - self.p.buy_threshold)
-            status = self.create_status_line(trigger, self.data.close[0], self.ma[0], "waiting BUY")
-            self.log(f"Status: {status}")
+            # The status line is only for the log, don't build it when logging is off
+            if self.p.printlog:
+                status = self.create_status_line(trigger, self.data.close[0], self.ma[0], "waiting BUY")
+                self.log(f"Status: {status}")
             cash = self.broker.getcash()
             if cash < self.p.min_order:
-                self.log(f"Cash ({cash:.2f}) is below min_order ({self.p.min_order}). Skipping buy.", color=YELLOW)
+                if self.p.printlog:
+                    self.log(f"Cash ({cash:.2f}) is below min_order ({self.p.min_order}). Skipping buy.", color=YELLOW)
                 return
             size = (cash / self.data.close[0]) * 0.95
             if self.data.close[0] < trigger:
@@ -85,11 +96,12 @@ class market_average(bt.Strategy):
                 self.order = self.buy(size=size)
         else:
             # When in a position, we're waiting to sell.
-            profit = self.data.close[0] - self.position.price
-            profit_pct = (profit / self.position.price) * 100
             target = self.position.price * (1 + self.p.sell_threshold)
-            status = self.create_status_line(self.position.price, self.data.close[0], target, "waiting SELL", profit, profit_pct)
-            self.log(f"Status: {status}")
+            if self.p.printlog:
+                profit = self.data.close[0] - self.position.price
+                profit_pct = (profit / self.position.price) * 100
+                status = self.create_status_line(self.position.price, self.data.close[0], target, "waiting SELL", profit, profit_pct)
+                self.log(f"Status: {status}")
             if self.data.close[0] > target:
                 self.log(f"SELL SIGNAL: Price {self.data.close[0]:.2f} above target {target:.2f}", color=RED)
                 self.order = self.sell(size=self.position.size)
@@ -112,7 +124,8 @@ class market_average(bt.Strategy):
 
 if __name__ == '__main__':
 
-    from scenario_XRPUSDT import create_cerebro_with_warmup
+    # Run from the repository root: python -m lib.strategy_01_market_average
+    from lib.scenario_XRPUSDT import create_cerebro_with_warmup
 
     cerebro = create_cerebro_with_warmup()
     
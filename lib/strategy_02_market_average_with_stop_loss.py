@@ -1,12 +1,13 @@
 #!/usr/bin/env python3
 import backtrader as bt
+import numpy as np
 from datetime import datetime, timedelta, timezone
+from lib.bar_time import bar_lag_seconds
+from lib.indicators import MOVING_AVERAGES
+from lib.log_colors import PRINT_GREEN as GREEN, PRINT_RED as RED, PRINT_YELLOW as YELLOW, PRINT_RESET as RESET
 
-# ANSI color codes for convenience.
-GREEN = '\033[0;32m'
-RED = '\033[0;31m'
-YELLOW = '\033[0;33m'
-RESET = '\033[0m'
+# Status bars are sliced out of one prebuilt dash string instead of multiplying new ones
+BAR_DASHES = '-' * 80
 
 class market_average_with_stop_loss(bt.Strategy):
 
@@ -21,13 +22,25 @@ class market_average_with_stop_loss(bt.Strategy):
         ('printlog', True)         # Set to False to disable printing
     )
 
+    # Timestamp text of the last bar logged (several lines are often logged per bar)
+    _stamp_num = None
+    _stamp = ''
+
     def printout(self, txt, color=None):
         """Simple print wrapper that adds a color if enabled."""
-        if self.p.printlog:
-            now = self.datas[0].datetime.datetime(0) if len(self.datas[0]) > 0 else datetime.now()
-            if color:
-                txt = f"{color}{txt}{RESET}"
-            print(f"{now.isoformat()} {txt}")
+        if not self.p.printlog:
+            return
+        if len(self.datas[0]) > 0:
+            bar_num = self.datas[0].datetime[0]
+            if bar_num != self._stamp_num:
+                self._stamp_num = bar_num
+                self._stamp = self.datas[0].datetime.datetime(0).isoformat()
+            stamp = self._stamp
+        else:
+            stamp = datetime.now().isoformat()
+        if color:
+            txt = f"{color}{txt}{RESET}"
+        print(f"{stamp} {txt}")
 
     def create_status_line(self, buy_val, current, sell_val, state, profit=None, profit_pct=None, width=30):
         """
@@ -47,65 +60,90 @@ class market_average_with_stop_loss(bt.Strategy):
             ratio = (current - lower) / (upper - lower)
             ratio = max(0, min(1, ratio))
             pos = int(ratio * width)
-        bar = "-" * pos + "{"+ f"{current:8.4f}"  +"}" + "-" * (width - pos)
+        dashes = BAR_DASHES if width <= len(BAR_DASHES) else '-' * width
+        bar = f"{dashes[:pos]}{{{current:8.4f}}}{dashes[:width - pos]}"
         if state == "waiting BUY":
             return f"Waiting BUY : {buy_val:8.4f} |{bar}| {sell_val:8.4f} |"
         else:
             return f"Waiting SELL: {buy_val:8.4f} |{bar}| {sell_val:8.4f} | P/L: {profit:8.4f} ({profit_pct:6.2f}%)"
 
     def __init__(self):
-        avg_type = self.p.avg_type.upper()
-        if avg_type == 'SMA':
-            self.ma = bt.indicators.SimpleMovingAverage(self.data.close, period=self.p.sma_period)
-        elif avg_type == 'EMA':
-            self.ma = bt.indicators.ExponentialMovingAverage(self.data.close, period=self.p.sma_period)
-        elif avg_type == 'WMA':
-            self.ma = bt.indicators.WeightedMovingAverage(self.data.close, period=self.p.sma_period)
-        else:
-            raise ValueError(f"Unknown avg_type: {self.p.avg_type}")
+        try:
+            moving_average = MOVING_AVERAGES[self.p.avg_type.upper()]
+        except KeyError:
+            raise ValueError(f"Unknown avg_type: {self.p.avg_type}") from None
+        self.ma = moving_average(self.data.close, period=self.p.sma_period)
         self.order = None
         self.entry_price = None
+        self.target_price_sell = None  # take-profit and stop-loss levels of the open position,
+        self.stop_loss_price = None    # fixed from entry until exit (see set_entry_price)
+        self.closes = None    # per-bar close prices, filled in by nextstart() for backtests
+        self.triggers = None  # per-bar buy triggers (MA * (1 - buy_threshold))
         self.printout(f"Strategy initialized with avg_type {self.p.avg_type}, sma_period {self.p.sma_period}", color=YELLOW)
 
+    def set_entry_price(self, price):
+        """Record the position's entry price and the exit levels derived from it."""
+        self.entry_price = price
+        self.target_price_sell = price * (1 + self.p.sell_threshold)
+        self.stop_loss_price = price * (1 - self.p.stop_loss)
+
+    def nextstart(self):
+        # With runonce (the default for backtests) the moving average has already been
+        # calculated over the whole preloaded feed, so work out every bar's buy trigger
+        # in one vector operation and let next() just index the plain Python lists.
+        # Live feeds grow bar by bar and keep reading the lines instead.
+        if not self.p.trade_on_live and len(self.ma.array) == self.data.buflen():
+            self.closes = self.data.close.array
+            self.triggers = (np.asarray(self.ma.array) * (1 - self.p.buy_threshold)).tolist()
+        self.next()
+
     def next(self):
         # If live trading is enabled, skip bars that are too old.
         if self.p.trade_on_live:
-            # Make bar_time timezone-aware.
-            bar_time = self.datas[0].datetime.datetime(0).replace(tzinfo=timezone.utc)
-            now = datetime.now(tz=timezone.utc)
-            lag = (now - bar_time).total_seconds()
+            lag = bar_lag_seconds(self.datas[0])
             if lag > self.p.live_lag_seconds:
-                self.printout(f"Skipping bar. Bar lag {lag:.1f} sec exceeds threshold.", color=YELLOW)
+                if self.p.printlog:  # every bar of a historical replay ends here
+                    self.printout(f"Skipping bar. Bar lag {lag:.1f} sec exceeds threshold.", color=YELLOW)
                 return
             
-        target_price_sell = self.data.close[0] * (1 + self.p.sell_threshold)
+        if self.triggers is not None:
+            i = len(self) - 1
+            close = self.closes[i]
+            trigger = self.triggers[i]
+        else:
+            close = self.data.close[0]
+            trigger = self.ma[0] * (1 - self.p.buy_threshold)
 
         if not self.position:
-            trigger = self.ma[0] * (1 - self.p.buy_threshold)
-            status = self.create_status_line(trigger, self.data.close[0], self.data.close[0], "waiting BUY")
-            self.printout(f"{status}")
-            if self.data.close[0] <= trigger:
-                self.printout(f"BUY SIGNAL: Price {self.data.close[0]:.4f} below trigger {trigger:.4f}", color=GREEN)
-                self.order = self.buy(size=(self.broker.getcash() / self.data.close[0]) * 0.95)
+            # The status line is only for the log, don't build it when logging is off
+            if self.p.printlog:
+                status = self.create_status_line(trigger, close, close, "waiting BUY")
+                self.printout(f"{status}")
+            if close <= trigger:
+                self.printout(f"BUY SIGNAL: Price {close:.4f} below trigger {trigger:.4f}", color=GREEN)
+                self.order = self.buy(size=(self.broker.getcash() / close) * 0.95)
         else:
-
-            target_price_sell = self.position.price * (1 + self.p.sell_threshold)
-            stop_loss_price = self.position.price * (1 - self.p.stop_loss)
-            profit = self.data.close[0] - self.position.price
-            profit_pct = (profit / self.position.price) * 100
-            status = self.create_status_line(self.position.price, self.data.close[0], target_price_sell, "waiting SELL", profit, profit_pct)
-            self.printout(f"{status}")
-            if self.data.close[0] <= stop_loss_price:
-                self.printout(f"STOP LOSS SIGNAL: Price {self.data.close[0]:.4f} below stop loss {stop_loss_price:.4f}", color=RED)
+            if self.stop_loss_price is None:
+                # Position opened before this run (e.g. a live restart), no buy was seen
+                self.set_entry_price(self.position.price)
+            target_price_sell = self.target_price_sell
+            stop_loss_price = self.stop_loss_price
+            if self.p.printlog:
+                profit = close - self.entry_price
+                profit_pct = (profit / self.entry_price) * 100
+                status = self.create_status_line(self.entry_price, close, target_price_sell, "waiting SELL", profit, profit_pct)
+                self.printout(f"{status}")
+            if close <= stop_loss_price:
+                self.printout(f"STOP LOSS SIGNAL: Price {close:.4f} below stop loss {stop_loss_price:.4f}", color=RED)
                 self.order = self.sell(size=self.position.size)
-            elif self.data.close[0] >= target_price_sell:
-                self.printout(f"TAKE PROFIT SIGNAL: Price {self.data.close[0]:.4f} above target {target_price_sell:.4f}", color=RED)
+            elif close >= target_price_sell:
+                self.printout(f"TAKE PROFIT SIGNAL: Price {close:.4f} above target {target_price_sell:.4f}", color=RED)
                 self.order = self.sell(size=self.position.size)
 
     def notify_order(self, order):
         if order.status in [order.Completed]:
             if order.isbuy():
-                self.entry_price = self.position.price
+                self.set_entry_price(self.position.price)
                 self.printout(f"BUY EXECUTED at {self.entry_price:.4f}", color=GREEN)
             elif order.issell():
                 exit_price = self.data.close[0]
@@ -119,7 +157,8 @@ class market_average_with_stop_loss(bt.Strategy):
 
 if __name__ == '__main__':
 
-    from scenario_XRPUSDT import create_cerebro_with_warmup
+    # Run from the repository root: python -m lib.strategy_02_market_average_with_stop_loss
+    from lib.scenario_XRPUSDT import create_cerebro_with_warmup
 
     cerebro = create_cerebro_with_warmup(    start_date = datetime(2025, 1, 1),
                                              end_date = datetime(2025, 3, 1),)
@@ -2,16 +2,22 @@ import backtrader as bt
 import pandas as pd
 import logging
 from datetime import datetime
+import numpy as np
+from lib.bar_time import bar_lag_seconds
+from lib.indicators import OnlineBollinger
+from lib.bollinger_signals import SELL, backtest_commission, as_expected, custom_bollinger_signals
+from lib.log_colors import GREEN, RED, YELLOW, color_handler
 
 # Configure logging globally.
 logging.basicConfig(level=logging.INFO,
-                    format='%(asctime)s %(levelname)s: %(message)s')
+                    handlers=[color_handler('%(asctime)s %(levelname)s: %(message)s')])
 
-# ANSI color codes for convenience.
-GREEN = '\033[0;32m'
-RED = '\033[0;31m'
-YELLOW = '\033[0;33m'
-RESET = '\033[0m'
+# Messages go through a logger named after this module (handled by the root handler
+# above), so this strategy's output can be silenced or redirected on its own.
+_logger = logging.getLogger(__name__)
+
+# Status bars are sliced out of one prebuilt dash string instead of multiplying new ones
+BAR_DASHES = '-' * 80
 
 """
 CustomBollingerStrategy: A Trading Strategy Based on Custom Bollinger Bands
@@ -52,16 +58,25 @@ class CustomBollingerStrategy(bt.Strategy):
         ('min_order', 10.0)       # Minimum cash required to place an order
     )
 
+    # Timestamp text of the last bar logged, reused by the other lines logged on that bar
+    _stamp_num = None
+    _stamp = ''
+
     def log(self, txt, dt=None, color=None):
+        if not self.p.log_enabled or not _logger.isEnabledFor(logging.INFO):
+            return
         # Use the data feed's datetime if available; otherwise, fallback to current time.
-        if dt is None:
-            if len(self.datas[0]) > 0:
-                dt = self.datas[0].datetime.datetime(0)
-            else:
-                dt = datetime.now()
-        if color:
-            txt = f"{color}{txt}{RESET}"
-        logging.info(f'{dt.isoformat()} {txt}')
+        if dt is not None:
+            stamp = dt.isoformat()
+        elif len(self.datas[0]) > 0:
+            bar_num = self.datas[0].datetime[0]
+            if bar_num != self._stamp_num:
+                self._stamp_num = bar_num
+                self._stamp = self.datas[0].datetime.datetime(0).isoformat()
+            stamp = self._stamp
+        else:
+            stamp = datetime.now().isoformat()
+        _logger.info('%s %s', stamp, txt, extra={'color': color})
 
     def create_status_line(self, lower_val, current, upper_val, state, profit=None, profit_pct=None, width=40):
         """
@@ -80,24 +95,27 @@ class CustomBollingerStrategy(bt.Strategy):
         if high == low:
             pos = width // 2
         else:
+            # Clamp the marker to the bar with comparisons instead of max(0, min(1, ...)) calls
             ratio = (current - low) / (high - low)
-            ratio = max(0, min(1, ratio))
-            pos = int(ratio * width)
-        bar = "-" * pos + "*" + "-" * (width - pos)
+            pos = 0 if ratio <= 0.0 else int(ratio * width) if ratio < 1.0 else width
+        dashes = BAR_DASHES if width <= len(BAR_DASHES) else '-' * width
 
+        # One %-format per line, with the bar's two dash runs sliced straight into it
         if state == "waiting BUY":
-            return f"waiting BUY: {lower_val:.4f} |{bar}| {current:.4f}"
+            return "waiting BUY: %.4f |%s*%s| %.4f" % (lower_val, dashes[:pos], dashes[:width - pos], current)
         else:
-            return f"waiting SELL: Entry {lower_val:.4f} -> Target {upper_val:.4f} |{bar}| {current:.4f} | P/L: {profit:.4f} ({profit_pct:.2f}%)"
+            return "waiting SELL: Entry %.4f -> Target %.4f |%s*%s| %.4f | P/L: %.4f (%.2f%%)" % (
+                lower_val, upper_val, dashes[:pos], dashes[:width - pos], current, profit, profit_pct)
 
     def __init__(self):
-        # Compute the simple moving average and standard deviation.
-        self.sma = bt.indicators.SimpleMovingAverage(self.data.close, period=self.p.period)
-        self.std = bt.indicators.StandardDeviation(self.data.close, period=self.p.period)
-        
-        # Define custom bands.
-        self.lower_band = self.sma - self.std * self.p.lower_dev
-        self.upper_band = self.sma + self.std * self.p.upper_dev
+        # Simple moving average, standard deviation and the custom bands (O(1) per bar).
+        self.bollinger = OnlineBollinger(self.data.close, period=self.p.period,
+                                         lower_dev=self.p.lower_dev, upper_dev=self.p.upper_dev)
+        self.lower_band = self.bollinger.lower
+        self.upper_band = self.bollinger.upper
+        self.closes = self.lowers = self.uppers = None  # whole-feed arrays, set by nextstart() in backtests
+        self.signals = None  # per-bar decisions, worked out up front by nextstart() in quiet backtests
+        self.order_signal = None
 
         self.order = None   # Track pending orders.
         self.last_order_volume = 0
@@ -105,60 +123,109 @@ class CustomBollingerStrategy(bt.Strategy):
         
         self.log("Strategy initialized.", color=YELLOW)
 
+    def nextstart(self):
+        # In a runonce backtest the bands already cover the whole preloaded feed (their
+        # arrays are longer than the bars seen so far), so let next() index the arrays
+        # directly instead of going through the line buffers on every bar.
+        if len(self.upper_band.array) > len(self):
+            self.closes = self.data.close.array
+            self.lowers = self.lower_band.array
+            self.uppers = self.upper_band.array
+
+            # Without live trading or logging to do, run the rules over the whole feed in
+            # one compiled pass now and just replay the resulting orders bar by bar.
+            commission = backtest_commission(self)
+            if not (self.p.trade_on_live or self.p.log_enabled or self.position) and commission is not None:
+                self.signals = custom_bollinger_signals(
+                    np.array(self.data.open.array), np.array(self.closes),
+                    np.array(self.lowers), np.array(self.uppers),
+                    len(self) - 1, self.broker.getcash(), commission, self.p.min_order,
+                ).tolist()
+        self.next()
+
     def next(self):
+        if self.signals is not None:
+            i = len(self) - 1
+            signal = self.signals[i]
+            if signal:
+                self.order_signal = signal
+                if signal == SELL:
+                    self.order = self.sell(size=self.last_order_volume)
+                else:
+                    self.last_order_volume = (self.broker.getcash() / self.closes[i]) * 0.95
+                    self.order = self.buy(size=self.last_order_volume)
+            return
+
         # If trade_on_live is enabled, skip processing if the current bar is too old.
         if self.p.trade_on_live:
-            bar_time = self.datas[0].datetime.datetime(0)
-            now = datetime.utcnow()
-            lag = (now - bar_time).total_seconds()
+            lag = bar_lag_seconds(self.datas[0])
             if lag > self.p.live_lag_seconds:
-                self.log(f"Skipping bar. Bar time lag is {lag:.1f} seconds, exceeding threshold.", color=YELLOW)
+                if self.p.log_enabled:
+                    self.log(f"Skipping bar. Bar time lag is {lag:.1f} seconds, exceeding threshold.", color=YELLOW)
                 return
 
-        # Build and log the dynamic status line.
-        if not self.position:
-            status = self.create_status_line(self.lower_band[0], self.data.close[0], self.upper_band[0], "waiting BUY")
+        if self.uppers is not None:
+            i = len(self) - 1
+            close, lower, upper = self.closes[i], self.lowers[i], self.uppers[i]
         else:
-            profit = self.data.close[0] - self.position.price
-            profit_pct = (profit / self.position.price) * 100
-            status = self.create_status_line(self.position.price, self.data.close[0], self.upper_band[0], "waiting SELL", profit, profit_pct)
-        self.log(f"Status: {status}")
+            close, lower, upper = self.data.close[0], self.lower_band[0], self.upper_band[0]
+
+        # The position property looks the position up in the broker on every access
+        position = self.position
+
+        # Build and log the dynamic status line (only when it is going to be logged:
+        # formatting it is most of the work of a bar otherwise).
+        if self.p.log_enabled:
+            if not position:
+                status = self.create_status_line(lower, close, upper, "waiting BUY")
+            else:
+                entry = position.price
+                profit = close - entry
+                profit_pct = (profit / entry) * 100
+                status = self.create_status_line(entry, close, upper, "waiting SELL", profit, profit_pct)
+            self.log(f"Status: {status}")
 
         # If an order is pending, skip processing.
         if self.order:
-            self.log("Order pending, skipping this bar.", color=YELLOW)
+            if self.p.log_enabled:
+                self.log("Order pending, skipping this bar.", color=YELLOW)
             return
         
-        cash = self.broker.getcash()
-        # self.log(f"Available cash: {cash:.4f}")
-
-        # Enforce minimum order value before attempting to buy.
-        if not self.position and cash < self.p.min_order:
-            self.log(f"Cash ({cash:.4f}) below minimum order threshold ({self.p.min_order}), skipping buy.", color=YELLOW)
-            return
-
         # If not in a position, check for a buy signal.
-        if not self.position:
-            if self.data.close[0] < self.lower_band[0]:
-                self.last_order_volume = (cash / self.data.close[0]) * 0.95
-                self.log(f"Buy signal detected at price {self.data.close[0]:.4f}. Placing buy order for size: {self.last_order_volume:.4f}", color=GREEN)
+        if not position:
+            cash = self.broker.getcash()  # only needed to size a buy
+            # self.log(f"Available cash: {cash:.4f}")
+
+            # Enforce minimum order value before attempting to buy.
+            if cash < self.p.min_order:
+                if self.p.log_enabled:
+                    self.log(f"Cash ({cash:.4f}) below minimum order threshold ({self.p.min_order}), skipping buy.", color=YELLOW)
+                return
+
+            if close < lower:
+                self.last_order_volume = (cash / close) * 0.95
+                self.log(f"Buy signal detected at price {close:.4f}. Placing buy order for size: {self.last_order_volume:.4f}", color=GREEN)
                 self.order = self.buy(size=self.last_order_volume)
         # If in a position, check for a sell signal.
-        elif self.position.size > 0:
-            if self.data.close[0] > self.upper_band[0]:
-                self.log(f"Sell signal detected at price {self.data.close[0]:.4f}. Placing sell order for size: {self.last_order_volume:.4f}", color=RED)
+        elif position.size > 0:
+            if close > upper:
+                self.log(f"Sell signal detected at price {close:.4f}. Placing sell order for size: {self.last_order_volume:.4f}", color=RED)
                 self.order = self.sell(size=self.last_order_volume)
 
     def notify_order(self, order):
+        if self.signals is not None and not order.alive() and not as_expected(order, self.order_signal):
+            self.signals = None  # the broker didn't follow the replayed signals: back to the rules in next()
         if order.status in [order.Completed]:
             if order.isbuy():
                 self.entry_price = self.position.price
-                self.log(f"BUY EXECUTED at {self.entry_price:.4f}", color=GREEN)
+                if self.p.log_enabled:
+                    self.log(f"BUY EXECUTED at {self.entry_price:.4f}", color=GREEN)
             elif order.issell():
-                exit_price = self.data.close[0]
-                profit = exit_price - self.entry_price
-                profit_pct = (profit / self.entry_price) * 100
-                self.log(f"SELL EXECUTED at {exit_price:.4f} | Profit: {profit:.4f} ({profit_pct:.2f}%)", color=RED)
+                if self.p.log_enabled:
+                    exit_price = self.data.close[0]
+                    profit = exit_price - self.entry_price
+                    profit_pct = (profit / self.entry_price) * 100
+                    self.log(f"SELL EXECUTED at {exit_price:.4f} | Profit: {profit:.4f} ({profit_pct:.2f}%)", color=RED)
             self.order = None
         elif order.status in [order.Canceled, order.Margin, order.Rejected]:
             self.log(f"Order {order.Status[order.status]}", color=YELLOW)
@@ -166,7 +233,8 @@ class CustomBollingerStrategy(bt.Strategy):
 
 if __name__ == '__main__':
 
-    from scenario_XRPUSDT import create_cerebro_with_warmup
+    # Run from the repository root: python -m lib.strategy_03_CustomBollinger
+    from lib.scenario_XRPUSDT import create_cerebro_with_warmup
 
     cerebro = create_cerebro_with_warmup(    start_date = datetime(2025, 1, 1),
                                              end_date = datetime(2025, 3, 1),)
@@ -1,12 +1,9 @@
 #!/usr/bin/env python3
 import backtrader as bt
 from datetime import datetime, timedelta
-
-# ANSI color codes for convenience.
-GREEN = '\033[0;32m'
-RED = '\033[0;31m'
-YELLOW = '\033[0;33m'
-RESET = '\033[0m'
+from lib.bar_time import bar_lag_seconds
+from lib.indicators import MOVING_AVERAGES
+from lib.log_colors import PRINT_GREEN as GREEN, PRINT_RED as RED, PRINT_YELLOW as YELLOW, PRINT_RESET as RESET
 
 class market_average_with_stop_loss(bt.Strategy):
     params = (
@@ -20,81 +17,111 @@ class market_average_with_stop_loss(bt.Strategy):
         ('printlog', True)         # Set to False to disable printing
     )
 
+    # Timestamp text of the last bar logged (several lines are often logged per bar)
+    _stamp_num = None
+    _stamp = ''
+
     def printout(self, txt, color=None):
-        if self.p.printlog:
-            now = self.datas[0].datetime.datetime(0) if len(self.datas[0]) > 0 else datetime.now()
-            if color:
-                txt = f"{color}{txt}{RESET}"
-            print(f"{now.isoformat()} {txt}")
+        if not self.p.printlog:
+            return
+        if len(self.datas[0]) > 0:
+            bar_num = self.datas[0].datetime[0]
+            if bar_num != self._stamp_num:
+                self._stamp_num = bar_num
+                self._stamp = self.datas[0].datetime.datetime(0).isoformat()
+            stamp = self._stamp
+        else:
+            stamp = datetime.now().isoformat()
+        if color:
+            txt = f"{color}{txt}{RESET}"
+        print(f"{stamp} {txt}")
 
     def __init__(self):
         # Set up moving average based on the chosen type.
-        avg_type = self.p.avg_type.upper()
-        if avg_type == 'SMA':
-            self.ma = bt.indicators.SimpleMovingAverage(self.data.close, period=self.p.sma_period)
-        elif avg_type == 'EMA':
-            self.ma = bt.indicators.ExponentialMovingAverage(self.data.close, period=self.p.sma_period)
-        elif avg_type == 'WMA':
-            self.ma = bt.indicators.WeightedMovingAverage(self.data.close, period=self.p.sma_period)
-        else:
-            raise ValueError(f"Unknown avg_type: {self.p.avg_type}")
+        try:
+            moving_average = MOVING_AVERAGES[self.p.avg_type.upper()]
+        except KeyError:
+            raise ValueError(f"Unknown avg_type: {self.p.avg_type}") from None
+        self.ma = moving_average(self.data.close, period=self.p.sma_period)
 
-        # No persistent order storage—we cancel any order each cycle.
-        self.order = None
+        self.order = None        # pending entry order (parent of a buy bracket)
+        self.exit_orders = None  # live [stop, target] sell orders of the open position
         self.entry_price = None
+        # Stop/target levels of the pending entry bracket or of the live exit orders; the
+        # orders are only replaced when these move, not re-placed on every bar
+        self._last_stop = None
+        self._last_target = None
+        # Stop and target as multiples of the entry price
+        self._stop_mult = 1 - self.p.stop_loss
+        self._target_mult = 1 + self.p.sell_threshold
         self.printout(f"Strategy initialized with avg_type {self.p.avg_type}, sma_period {self.p.sma_period}", color=YELLOW)
 
+    def _levels_unchanged(self, stop_loss_price, target_price):
+        """Whether the stop/target levels are (within 1e-6) the ones already in the market."""
+        return (self._last_stop is not None
+                and abs(stop_loss_price - self._last_stop) < 1e-6 * self._last_stop
+                and abs(target_price - self._last_target) < 1e-6 * self._last_target)
+
     def next(self):
         # If live trading is enabled, skip bars that are too old.
         if self.p.trade_on_live:
-            bar_time = self.datas[0].datetime.datetime(0)
-            now = datetime.now(datetime.UTC)  # assuming UTC timestamps
-            lag = (now - bar_time).total_seconds()
+            lag = bar_lag_seconds(self.datas[0])
             if lag > self.p.live_lag_seconds:
-                self.printout(f"Skipping bar. Bar lag {lag:.1f} sec exceeds threshold.", color=YELLOW)
+                if self.p.printlog:
+                    self.printout(f"Skipping bar. Bar lag {lag:.1f} sec exceeds threshold.", color=YELLOW)
                 return
 
-        # Every cycle, cancel any existing pending orders.
-        if self.order:
-            self.cancel(self.order)
-            self.order = None
-            self.printout("Cancelled pending order", color=YELLOW)
-
-        # When not in position, place a new entry bracket order unconditionally.
+        # When not in position, keep an entry bracket order at the current close.
         if not self.position:
-            size = (self.broker.getcash() / self.data.close[0]) * 0.95
             entry_price = self.data.close[0]
-            stop_loss_price = entry_price * (1 - self.p.stop_loss)
-            target_price = entry_price * (1 + self.p.sell_threshold)
-            self.order = self.buy_bracket(
+            stop_loss_price = entry_price * self._stop_mult
+            target_price = entry_price * self._target_mult
+            if self.order:
+                if self._levels_unchanged(stop_loss_price, target_price):
+                    return  # the pending entry already sits at these levels
+                # Cancelling the entry also cancels its stop/target legs.
+                self.cancel(self.order)
+                self.order = None
+                self.printout("Cancelled pending order", color=YELLOW)
+
+            size = (self.broker.getcash() / entry_price) * 0.95
+            self.order, stop_order, target_order = self.buy_bracket(
                 size=size,
                 price=entry_price,
                 stopprice=stop_loss_price,
                 limitprice=target_price
             )
-            self.printout(
-                f"Placing new entry order: entry={entry_price:.4f}, stop={stop_loss_price:.4f}, target={target_price:.4f}",
-                color=GREEN)
+            # The bracket's legs become the exit orders once the entry fills
+            self.exit_orders = [stop_order, target_order]
+            self._last_stop, self._last_target = stop_loss_price, target_price
+            # The entry follows the close, so this runs on most bars while flat:
+            # only format the message when it will be printed
+            if self.p.printlog:
+                self.printout(
+                    f"Placing new entry order: entry={entry_price:.4f}, stop={stop_loss_price:.4f}, target={target_price:.4f}",
+                    color=GREEN)
         else:
-            # If already in a position, update exit orders.
-            # We'll use the original entry price stored when the position was opened.
+            # If already in a position, keep the exit orders at the levels of the
+            # original entry price stored when the position was opened.
             entry_price = self.entry_price if self.entry_price is not None else self.position.price
-            stop_loss_price = entry_price * (1 - self.p.stop_loss)
-            target_price = entry_price * (1 + self.p.sell_threshold)
-            # Here, we cancel the previous exit orders (if any) and place new ones.
-            # Note: In a bracket order, the exit orders are part of a multi-order,
-            # so in a real-world scenario, you might have to manage each child order separately.
-            
-            self.order = self.sell_bracket(
-                size=self.position.size,
-                price=self.data.close[0],
-                stopprice=stop_loss_price,
-                limitprice=target_price
-            )
+            stop_loss_price = entry_price * self._stop_mult
+            target_price = entry_price * self._target_mult
+            if self.exit_orders is not None and self._levels_unchanged(stop_loss_price, target_price):
+                return
+
+            # The stop and target cancel each other, so both legs are replaced together.
+            if self.exit_orders is not None:
+                self.cancel(self.exit_orders[0])
+            stop_order = self.sell(size=self.position.size, exectype=bt.Order.Stop, price=stop_loss_price)
+            target_order = self.sell(size=self.position.size, exectype=bt.Order.Limit, price=target_price,
+                                     oco=stop_order)
+            self.exit_orders = [stop_order, target_order]
+            self._last_stop, self._last_target = stop_loss_price, target_price
 
-            self.printout(
-                f"Updating exit orders: new stop={stop_loss_price:.4f}, new target={target_price:.4f}",
-                color=YELLOW)
+            if self.p.printlog:
+                self.printout(
+                    f"Updating exit orders: new stop={stop_loss_price:.4f}, new target={target_price:.4f}",
+                    color=YELLOW)
 
     def notify_order(self, order):
         if order.status in [order.Completed]:
@@ -106,13 +133,22 @@ class market_average_with_stop_loss(bt.Strategy):
                 profit = exit_price - self.entry_price
                 profit_pct = (profit / self.entry_price) * 100
                 self.printout(f"SELL EXECUTED at {exit_price:.4f} | Profit: {profit:.4f} ({profit_pct:.2f}%)", color=RED)
-            self.order = None
+                # The other exit leg is cancelled with it
+                self.exit_orders = None
+                self._last_stop = self._last_target = None
+            if self.order and order.ref == self.order.ref:  # notifications carry copies of the orders
+                self.order = None
         elif order.status in [order.Canceled, order.Margin, order.Rejected]:
             self.printout("Order cancelled/margin/rejected", color=YELLOW)
-            self.order = None
+            if self.order and order.ref == self.order.ref:
+                # The entry is gone and its legs with it; the next bar places a new one
+                self.order = None
+                self.exit_orders = None
+                self._last_stop = self._last_target = None
 
 if __name__ == '__main__':
-    from scenario_XRPUSDT import create_cerebro_with_warmup
+    # Run from the repository root: python -m lib.strategy_04_market_average_with_stop_loss_place_limit_order
+    from lib.scenario_XRPUSDT import create_cerebro_with_warmup
     cerebro = create_cerebro_with_warmup()
     cerebro.addstrategy(market_average_with_stop_loss,
                         avg_type='EMA',
@@ -1,16 +1,22 @@
 #!/usr/bin/env python3
 import backtrader as bt
 import logging
-from datetime import datetime, timezone
+from datetime import datetime
+import numpy as np
+from lib.bar_time import bar_lag_seconds
+from lib.indicators import OnlineBollinger
+from lib.bollinger_signals import SELL, backtest_commission, as_expected, bollinger_sl_signals
+from lib.log_colors import GREEN, RED, YELLOW, color_handler
 
 # Configure logging globally
-logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+logging.basicConfig(level=logging.INFO, handlers=[color_handler('%(levelname)s: %(message)s')])
 
-# ANSI colors
-GREEN = '\033[0;32m'
-RED = '\033[0;31m'
-YELLOW = '\033[0;33m'
-RESET = '\033[0m'
+# Strategy messages go through this module's logger (into the root handler configured
+# above), so a run can quieten or redirect one strategy's output by its logger name.
+_logger = logging.getLogger(__name__)
+
+# Status bars are sliced out of one prebuilt dash string instead of multiplying new ones
+BAR_DASHES = '-' * 80
 
 class CustomBollingerStrategySL(bt.Strategy):
     """
@@ -36,14 +42,19 @@ class CustomBollingerStrategySL(bt.Strategy):
         ('min_order', 10.0)
     )
 
+    # Formatted time of the last bar logged; a bar often logs several lines
+    _stamp_num = None
+    _stamp = ''
+
     def log(self, txt, color=None):
         """Helper method for logging with optional color."""
-        if not self.p.log_enabled:
+        if not self.p.log_enabled or not _logger.isEnabledFor(logging.INFO):
             return
-        dt_str = self.datas[0].datetime.datetime(0).strftime('%Y-%m-%d %H:%M:%S')
-        if color:
-            txt = f"{color}{txt}{RESET}"
-        logging.info(f"{dt_str} {txt}")
+        bar_num = self.datas[0].datetime[0]
+        if bar_num != self._stamp_num:
+            self._stamp_num = bar_num
+            self._stamp = self.datas[0].datetime.datetime(0).strftime('%Y-%m-%d %H:%M:%S')
+        _logger.info('%s %s', self._stamp, txt, extra={'color': color})
 
     def create_status_line(self, buy_val, current, sell_val, state, profit=None, profit_pct=None, width=30):
         """
@@ -61,104 +72,157 @@ class CustomBollingerStrategySL(bt.Strategy):
             pos = width // 2
         else:
             ratio = (current - lower) / (upper - lower)
-            ratio = max(0, min(1, ratio))
-            pos = int(ratio * width)
-        bar = "-" * pos + "{"+ f"{current:8.4f}"  +"}" + "-" * (width - pos)
+            pos = 0 if ratio <= 0.0 else int(ratio * width) if ratio < 1.0 else width  # clamped to the bar
+        dashes = BAR_DASHES if width <= len(BAR_DASHES) else '-' * width
         if state == "waiting BUY":
-            return f"Waiting BUY : {buy_val:8.4f} |{bar}| {sell_val:8.4f} |"
+            return "Waiting BUY : %8.4f |%s{%8.4f}%s| %8.4f |" % (
+                buy_val, dashes[:pos], current, dashes[:width - pos], sell_val)
         else:
-            return f"Waiting SELL: {buy_val:8.4f} |{bar}| {sell_val:8.4f} | P/L: {profit:8.4f} ({profit_pct:6.2f}%)"
+            return "Waiting SELL: %8.4f |%s{%8.4f}%s| %8.4f | P/L: %8.4f (%6.2f%%)" % (
+                buy_val, dashes[:pos], current, dashes[:width - pos], sell_val, profit, profit_pct)
 
     def __init__(self):
-        # Bollinger calculations
-        self.sma = bt.indicators.SimpleMovingAverage(self.data.close, period=self.p.period)
-        self.std = bt.indicators.StandardDeviation(self.data.close, period=self.p.period)
-
-        self.lower_band = self.sma - self.std * self.p.lower_dev
-        self.upper_band = self.sma + self.std * self.p.upper_dev
+        # Bollinger calculations (O(1) per bar)
+        self.bollinger = OnlineBollinger(self.data.close, period=self.p.period,
+                                         lower_dev=self.p.lower_dev, upper_dev=self.p.upper_dev)
+        self.lower_band = self.bollinger.lower
+        self.upper_band = self.bollinger.upper
+        self.closes = self.lowers = self.uppers = None  # whole-feed arrays, set by nextstart() in backtests
+        self.signals = None  # per-bar decisions, worked out up front by nextstart() in quiet backtests
+        self.order_signal = None
 
         self.order = None
         self.entry_price = None
+        self._stop_mult = 1 - self.p.stop_loss  # stop-loss level as a fraction of the entry price
 
         self.log("Strategy initialized.", color=YELLOW)
 
+    def nextstart(self):
+        # In a runonce backtest the bands already cover the whole preloaded feed (their
+        # arrays are longer than the bars seen so far), so let next() index the arrays
+        # directly instead of going through the line buffers on every bar.
+        if len(self.upper_band.array) > len(self):
+            self.closes = self.data.close.array
+            self.lowers = self.lower_band.array
+            self.uppers = self.upper_band.array
+
+            # Without live trading or logging to do, run the rules over the whole feed in
+            # one compiled pass now and just replay the resulting orders bar by bar
+            commission = backtest_commission(self)
+            if not (self.p.trade_on_live or self.p.log_enabled or self.position) and commission is not None:
+                self.signals = bollinger_sl_signals(
+                    np.array(self.data.open.array), np.array(self.closes),
+                    np.array(self.lowers), np.array(self.uppers),
+                    len(self) - 1, self.broker.getcash(), commission,
+                    self.p.min_order, self.p.stop_loss,
+                ).tolist()
+        self.next()
+
     def next(self):
         """Main logic each bar."""
+        if self.signals is not None:
+            i = len(self) - 1
+            signal = self.signals[i]
+            if signal:
+                self.order_signal = signal
+                if signal == SELL:
+                    self.order = self.sell(size=self.position.size)
+                else:
+                    self.order = self.buy(size=(self.broker.getcash() / self.closes[i]) * 0.95)
+            return
+
         # If trade_on_live is enabled, skip old bars
         if self.p.trade_on_live:
-            bar_time = self.datas[0].datetime.datetime(0).replace(tzinfo=timezone.utc)
-            now = datetime.now(tz=timezone.utc)
-            lag = (now - bar_time).total_seconds()
+            lag = bar_lag_seconds(self.datas[0])
             if lag > self.p.live_lag_seconds:
-                self.log(f"Skipping bar; bar lag {lag:.1f}s > threshold {self.p.live_lag_seconds}", color=YELLOW)
+                if self.p.log_enabled:
+                    self.log(f"Skipping bar; bar lag {lag:.1f}s > threshold {self.p.live_lag_seconds}", color=YELLOW)
                 return
 
-        # Build a dynamic status line
-        if not self.position:
-            status_line = self.create_status_line(
-                self.lower_band[0],
-                self.data.close[0],
-                self.upper_band[0],
-                state="waiting BUY"
-            )
+        if self.uppers is not None:
+            i = len(self) - 1
+            close, lower, upper = self.closes[i], self.lowers[i], self.uppers[i]
         else:
-            # If in position, compute profit stats
-            profit = self.data.close[0] - self.position.price
-            profit_pct = (profit / self.position.price) * 100
-            status_line = self.create_status_line(
-                self.position.price,
-                self.data.close[0],
-                self.upper_band[0],
-                state="waiting SELL",
-                profit=profit,
-                profit_pct=profit_pct
-            )
-        self.log(f"Status: {status_line}")
+            close, lower, upper = self.data.close[0], self.lower_band[0], self.upper_band[0]
+
+        # Fetch the position once; self.position asks the broker for it on each use
+        position = self.position
+
+        # Build a dynamic status line (only if it will be logged; formatting it costs
+        # more than the rest of the bar)
+        if self.p.log_enabled:
+            if not position:
+                status_line = self.create_status_line(
+                    lower,
+                    close,
+                    upper,
+                    state="waiting BUY"
+                )
+            else:
+                # If in position, compute profit stats
+                entry = position.price
+                profit = close - entry
+                profit_pct = (profit / entry) * 100
+                status_line = self.create_status_line(
+                    entry,
+                    close,
+                    upper,
+                    state="waiting SELL",
+                    profit=profit,
+                    profit_pct=profit_pct
+                )
+            self.log(f"Status: {status_line}")
 
         # If an order is pending, do nothing
         if self.order:
-            self.log("Order pending, skipping bar.", color=YELLOW)
+            if self.p.log_enabled:
+                self.log("Order pending, skipping bar.", color=YELLOW)
             return
 
-        # Check if we have enough cash to buy
-        cash = self.broker.getcash()
-        if not self.position and cash < self.p.min_order:
-            self.log(f"Cash {cash:.2f} < min_order {self.p.min_order}, skipping buy.", color=YELLOW)
-            return
+        if not position:
+            # Check if we have enough cash to buy
+            cash = self.broker.getcash()
+            if cash < self.p.min_order:
+                if self.p.log_enabled:
+                    self.log(f"Cash {cash:.2f} < min_order {self.p.min_order}, skipping buy.", color=YELLOW)
+                return
 
-        if not self.position:
             # Buy if price < lower band
-            if self.data.close[0] < self.lower_band[0]:
-                size = (cash / self.data.close[0]) * 0.95
-                self.log(f"Buy Signal: current {self.data.close[0]:.4f} < lower_band {self.lower_band[0]:.4f}, size={size:.2f}", color=GREEN)
+            if close < lower:
+                size = (cash / close) * 0.95
+                self.log(f"Buy Signal: current {close:.4f} < lower_band {lower:.4f}, size={size:.2f}", color=GREEN)
                 self.order = self.buy(size=size)
         else:
             # Check Stop Loss
-            stop_loss_price = self.position.price * (1 - self.p.stop_loss)
-            if self.data.close[0] <= stop_loss_price:
+            stop_loss_price = position.price * self._stop_mult
+            if close <= stop_loss_price:
                 self.log(
-                    f"STOP LOSS triggered @ {self.data.close[0]:.4f}; threshold={stop_loss_price:.4f}",
+                    f"STOP LOSS triggered @ {close:.4f}; threshold={stop_loss_price:.4f}",
                     color=RED
                 )
-                self.order = self.sell(size=self.position.size)
+                self.order = self.sell(size=position.size)
                 return
 
             # Check upper band => take profit
-            if self.data.close[0] > self.upper_band[0]:
-                self.log(f"Take Profit: current {self.data.close[0]:.4f} > upper_band {self.upper_band[0]:.4f}", color=RED)
-                self.order = self.sell(size=self.position.size)
+            if close > upper:
+                self.log(f"Take Profit: current {close:.4f} > upper_band {upper:.4f}", color=RED)
+                self.order = self.sell(size=position.size)
 
     def notify_order(self, order):
         """Handle order status changes."""
+        if self.signals is not None and not order.alive() and not as_expected(order, self.order_signal):
+            self.signals = None  # the broker didn't follow the replayed signals: back to the rules in next()
         if order.status in [order.Completed]:
             if order.isbuy():
                 self.entry_price = self.position.price
-                self.log(f"BUY EXECUTED @ {self.entry_price:.4f}", color=GREEN)
+                if self.p.log_enabled:
+                    self.log(f"BUY EXECUTED @ {self.entry_price:.4f}", color=GREEN)
             elif order.issell():
-                exit_price = self.data.close[0]
-                profit = exit_price - self.entry_price
-                profit_pct = (profit / self.entry_price) * 100
-                self.log(f"SELL EXECUTED @ {exit_price:.4f} | Profit: {profit:.4f} ({profit_pct:.2f}%)", color=RED)
+                if self.p.log_enabled:
+                    exit_price = self.data.close[0]
+                    profit = exit_price - self.entry_price
+                    profit_pct = (profit / self.entry_price) * 100
+                    self.log(f"SELL EXECUTED @ {exit_price:.4f} | Profit: {profit:.4f} ({profit_pct:.2f}%)", color=RED)
             self.order = None
         elif order.status in [order.Canceled, order.Margin, order.Rejected]:
             self.log(f"Order {order.Status[order.status]}", color=YELLOW)
@@ -167,7 +231,8 @@ class CustomBollingerStrategySL(bt.Strategy):
 
 if __name__ == '__main__':
 
-    from scenario_XRPUSDT import create_cerebro_with_warmup
+    # Run from the repository root: python -m lib.strategy_06_bollinger_with_stop_loss
+    from lib.scenario_XRPUSDT import create_cerebro_with_warmup
 
     cerebro = create_cerebro_with_warmup(    start_date = datetime(2025, 1, 1),
                                              end_date = datetime(2025, 3, 1),)
@@ -1,29 +1,40 @@
 import backtrader as bt
 import pandas as pd
-import tensorflow as tf
+import math
 import numpy as np
 from datetime import datetime
+from lib.ai_model import NumpyPredictor, OnnxPredictor
+from lib.features import OHLCV_COLUMNS, compute_features
+from lib.log_colors import PRINT_GREEN as GREEN, PRINT_RED as RED, PRINT_RESET as RESET
 
-# Optional ANSI colors
-GREEN = '\033[0;32m'
-RED = '\033[0;31m'
-YELLOW = '\033[0;33m'
-RESET = '\033[0m'
+# Status bars are sliced out of one prebuilt dash string instead of multiplying new ones
+BAR_DASHES = '-' * 80
 
 class AIThresholdStrategy(bt.Strategy):
     params = (
         ('model_path', 'trained_model.h5'),  # Path to your saved model
+        ('use_int8_model', False),  # True = run the int8 quantised copy of the model
         ('buy_threshold', -0.3),
         ('sell_threshold', 0.7),
         ('printlog', True),  # Turn logging on/off
     )
+    # Timestamp text of the last bar logged (a bar's status and order lines share it)
+    _stamp_num = None
+    _stamp = ''
+
     def log(self, txt, color=None):
         """Custom logger function. Prints datetime plus custom text."""
-        if self.p.printlog:
-            dt_str = self.datas[0].datetime.datetime(0).strftime('%Y-%m-%d %H:%M:%S')
-            if color:
-                txt = f"{color}{txt}{RESET}"
-            print(f"{dt_str} - {txt}")
+        if not self.p.printlog:
+            return
+        bar_num = self.datas[0].datetime[0]
+        if bar_num != self._stamp_num:
+            # Same text as strftime('%Y-%m-%d %H:%M:%S'), without the locale-aware strftime call
+            dt = self.datas[0].datetime.datetime(0)
+            self._stamp_num = bar_num
+            self._stamp = f"{dt.year:04d}-{dt.month:02d}-{dt.day:02d} {dt.hour:02d}:{dt.minute:02d}:{dt.second:02d}"
+        if color:
+            txt = f"{color}{txt}{RESET}"
+        print(f"{self._stamp} - {txt}")
 
 
     def create_status_line(
@@ -56,9 +67,8 @@ class AIThresholdStrategy(bt.Strategy):
             pos = int(ratio * width)
 
         # Build the bar: place the AI prediction in braces at the correct spot
-        left_side = "-" * pos
-        right_side = "-" * (width - pos)
-        bar = f"{left_side}{{{ai_pred:8.4f}}}{right_side}"
+        dashes = BAR_DASHES if width <= len(BAR_DASHES) else '-' * width
+        bar = f"{dashes[:pos]}{{{ai_pred:8.4f}}}{dashes[:width - pos]}"
 
         if state == "waiting BUY":
             return f"Waiting BUY : {low_val:8.4f} |{bar}| {high_val:8.4f} |"
@@ -70,103 +80,31 @@ class AIThresholdStrategy(bt.Strategy):
             )
 
     def __init__(self):
-        """Load a pre-trained model and define any indicators."""
-        self.model = tf.keras.models.load_model(self.p.model_path)
+        """Compute every bar's features and model prediction up front."""
         self.order = None
-        
-        # Attach all the indicators you need for your "x data"
-        self.rsi_5   = bt.indicators.RSI(self.data.close, period=5)
-        self.rsi_30  = bt.indicators.RSI(self.data.close, period=30)
-        self.rsi_200 = bt.indicators.RSI(self.data.close, period=200)
-        
-        self.bb_5   = bt.indicators.BollingerBands(self.data, period=5)
-        self.bb_30  = bt.indicators.BollingerBands(self.data, period=30)
-        self.bb_200 = bt.indicators.BollingerBands(self.data, period=200)
-
-        self.aroon_up_5   = bt.indicators.AroonUp(self.data, period=5)
-        self.aroon_down_5 = bt.indicators.AroonDown(self.data, period=5)
-        self.aroon_up_30   = bt.indicators.AroonUp(self.data, period=30)
-        self.aroon_down_30 = bt.indicators.AroonDown(self.data, period=30)
-        self.aroon_up_200   = bt.indicators.AroonUp(self.data, period=200)
-        self.aroon_down_200 = bt.indicators.AroonDown(self.data, period=200)
-
-        # AwesomeOscillator with different "fast"/"slow" combos
-        self.ao_5   = bt.indicators.AwesomeOscillator(self.data, fast=3, slow=5)
-        self.ao_30  = bt.indicators.AwesomeOscillator(self.data, fast=10, slow=30)
-        self.ao_200 = bt.indicators.AwesomeOscillator(self.data, fast=50, slow=200)
-
-        # Ichimoku
-        self.ichimoku   = bt.indicators.Ichimoku(self.data)
-
-        self.tema_5   = bt.indicators.TripleExponentialMovingAverage(self.data.close, period=5)
-        self.tema_30  = bt.indicators.TripleExponentialMovingAverage(self.data.close, period=30)
-        self.tema_200 = bt.indicators.TripleExponentialMovingAverage(self.data.close, period=200)
-        
-        self.macd_5   = bt.indicators.MACD(self.data.close, period_me1=4, period_me2=8, period_signal=3)
-        self.macd_30  = bt.indicators.MACD(self.data.close, period_me1=12, period_me2=30, period_signal=9)
-        self.macd_200 = bt.indicators.MACD(self.data.close, period_me1=50, period_me2=200, period_signal=20)
 
-        self.atr_5   = bt.indicators.ATR(self.data, period=5)
-        self.atr_30  = bt.indicators.ATR(self.data, period=30)
-        self.atr_200 = bt.indicators.ATR(self.data, period=200)
+        # The data is preloaded (the Cerebro default), so the whole feed is already
+        # here. Build the features with the vectorised NumPy/Numba code in lib.features,
+        # the same code that produced the training data (and matches Backtrader's
+        # indicators), instead of ~25 Backtrader indicators evaluated bar by bar.
+        prices = pd.DataFrame({col: np.frombuffer(getattr(self.data, col).array, dtype=np.float64)
+                               for col in OHLCV_COLUMNS})
+        features = compute_features(prices).to_numpy(dtype=np.float32)
+
+        # One model call for every bar; rows still warming up come back as NaN.
+        # The fp32 model runs on NumPy straight from the .h5 weights (no TensorFlow
+        # or ONNX Runtime session); the int8 copy needs ONNX Runtime's QLinear kernels.
+        if self.p.use_int8_model:
+            predictor = OnnxPredictor(self.p.model_path, calibration_features=features)
+        else:
+            predictor = NumpyPredictor(self.p.model_path)
+        self.predictions = predictor.predict(features).tolist()
 
     def next(self):
-        """Runs on every bar - gather features and pass them to the model."""
-        
-        # Gather features in the same order they were used to train the model:
-        feature_list = [
-            # Basic OHLCV
-            self.data.open[0],
-            self.data.high[0],
-            self.data.low[0],
-            self.data.close[0],
-            self.data.volume[0],
-            
-            # RSI (3 periods)
-            self.rsi_5[0],
-            self.rsi_30[0],
-            self.rsi_200[0],
-
-            # Bollinger top/mid/bot (3 periods)
-            self.bb_5.top[0],   self.bb_5.mid[0],   self.bb_5.bot[0],
-            self.bb_30.top[0],  self.bb_30.mid[0],  self.bb_30.bot[0],
-            self.bb_200.top[0], self.bb_200.mid[0], self.bb_200.bot[0],
-
-            # Aroon
-            self.aroon_up_5[0],   self.aroon_down_5[0],
-            self.aroon_up_30[0],  self.aroon_down_30[0],
-            self.aroon_up_200[0], self.aroon_down_200[0],
-
-            # Awesome
-            self.ao_5[0],
-            self.ao_30[0],
-            self.ao_200[0],
-
-            # Ichimoku
-            getattr(self.ichimoku, 'tenkan_sen', [None])[0],
-            getattr(self.ichimoku, 'kijun_sen', [None])[0],
-
-            # TEMA
-            self.tema_5[0],
-            self.tema_30[0],
-            self.tema_200[0],
-
-            # MACD sets
-            self.macd_5.macd[0],        self.macd_5.signal[0],
-            self.macd_30.macd[0],       self.macd_30.signal[0],
-            self.macd_200.macd[0],      self.macd_200.signal[0],
-
-            # ATR
-            self.atr_5[0],
-            self.atr_30[0],
-            self.atr_200[0],
-        ]
-
-        # Convert to a (1, num_features) array of float32
-        features = np.array([feature_list], dtype=np.float32)
-
-             # Predict with your loaded model
-        prediction = self.model.predict(features, verbose=0)[0][0]
+        """Runs on every bar - look up this bar's prediction and trade on it."""
+        prediction = self.predictions[len(self) - 1]
+        if math.isnan(prediction):
+            return  # indicators still warming up
 
         # Build a status line showing "prediction" between buy_threshold and sell_threshold
         if not self.position:
@@ -209,7 +147,7 @@ class AIThresholdStrategy(bt.Strategy):
 # -------------------------
 if __name__ == '__main__':
 
-    from scenario_XRPUSDT import create_cerebro_with_warmup
+    from lib.scenario_XRPUSDT import create_cerebro_with_warmup
     
     # Use your existing method to load data
     cerebro = create_cerebro_with_warmup(
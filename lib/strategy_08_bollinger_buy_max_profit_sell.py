@@ -2,15 +2,16 @@
 import backtrader as bt
 import logging
 from datetime import datetime
+import numpy as np
+from lib.indicators import OnlineBollinger
+from lib.bollinger_signals import SELL, backtest_commission, as_expected, trailing_stop_signals
+from lib.log_colors import GREEN, RED, YELLOW, color_handler
 
 # Configure logging globally.
-logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s: %(message)s')
+logging.basicConfig(level=logging.INFO, handlers=[color_handler('%(asctime)s %(levelname)s: %(message)s')])
 
-# ANSI color codes for convenience.
-GREEN = '\033[0;32m'
-RED = '\033[0;31m'
-YELLOW = '\033[0;33m'
-RESET = '\033[0m'
+# Module logger; its records propagate to the root handler configured above.
+_logger = logging.getLogger(__name__)
 
 
 class BollingerTrailingStopStrategy(bt.Strategy):
@@ -28,73 +29,127 @@ class BollingerTrailingStopStrategy(bt.Strategy):
         ('log_enabled', True),
     )
 
+    # Bar time (float) and its text for the last bar logged
+    _stamp_num = None
+    _stamp = ''
+
     def log(self, txt, dt=None, color=None):
         """Helper method for logging with optional color."""
-        if not self.p.log_enabled:
+        if not self.p.log_enabled or not _logger.isEnabledFor(logging.INFO):
             return
-        if dt is None:
-            dt = self.datas[0].datetime.datetime(0)
-        if color:
-            txt = f"{color}{txt}{RESET}"
-        logging.info(f"{dt.isoformat()} {txt}")
+        if dt is not None:
+            stamp = dt.isoformat()
+        else:
+            bar_num = self.datas[0].datetime[0]
+            if bar_num != self._stamp_num:
+                self._stamp_num = bar_num
+                self._stamp = self.datas[0].datetime.datetime(0).isoformat()
+            stamp = self._stamp
+        _logger.info('%s %s', stamp, txt, extra={'color': color})
 
     def __init__(self):
         """
         Setup indicators and placeholders for tracking the max price while in a position.
         """
         # Bollinger: middle = SMA, top = SMA + dev_factor*std, bot = SMA - dev_factor*std
-        self.sma = bt.indicators.SimpleMovingAverage(self.data.close, period=self.p.period)
-        self.std = bt.indicators.StandardDeviation(self.data.close, period=self.p.period)
-        self.upper_band = self.sma + self.std * self.p.dev_factor
-        self.lower_band = self.sma - self.std * self.p.dev_factor
+        self.bollinger = OnlineBollinger(self.data.close, period=self.p.period,
+                                         lower_dev=self.p.dev_factor, upper_dev=self.p.dev_factor)
+        self.upper_band = self.bollinger.upper
+        self.lower_band = self.bollinger.lower
+        self.closes = self.lowers = None  # whole-feed arrays, set by nextstart() in backtests
+        self.signals = None  # per-bar decisions, worked out up front by nextstart() in quiet backtests
+        self.order_signal = None
 
         self.order = None
         self.entry_price = None
         self.max_price_since_entry = None  # track highest close since position entry
+        self._trail_mult = 1 - self.p.trail_percent  # trailing stop as a fraction of that high
+        self._trail_stop_price = None  # max_price_since_entry * _trail_mult, updated with it
 
         self.log("Strategy initialized.", color=YELLOW)
 
+    def nextstart(self):
+        # In a runonce backtest the bands already cover the whole preloaded feed (their
+        # arrays are longer than the bars seen so far), so let next() index the arrays
+        # directly instead of going through the line buffers on every bar.
+        if len(self.lower_band.array) > len(self):
+            self.closes = self.data.close.array
+            self.lowers = self.lower_band.array
+
+            # Without logging to do, run the rules over the whole feed in one compiled
+            # pass now and just replay the resulting orders bar by bar (the kernel
+            # trades a fixed stake, so only with the default fixed-size sizer)
+            commission = backtest_commission(self)
+            sizer = self.getsizer()
+            if (not (self.p.log_enabled or self.position) and commission is not None
+                    and type(sizer) is bt.sizers.FixedSize and sizer.p.tranches == 1):
+                self.signals = trailing_stop_signals(
+                    np.array(self.data.open.array), np.array(self.closes), np.array(self.lowers),
+                    len(self) - 1, self.broker.getcash(), commission,
+                    float(sizer.p.stake), self.p.trail_percent,
+                ).tolist()
+        self.next()
+
     def next(self):
         """Main logic each bar."""
+        if self.signals is not None:
+            signal = self.signals[len(self) - 1]
+            if signal:
+                self.order_signal = signal
+                self.order = self.sell() if signal == SELL else self.buy()
+            return
+
         # If we already have a pending order, skip
         if self.order:
             return
 
+        if self.lowers is not None:
+            i = len(self) - 1
+            current_close, lower = self.closes[i], self.lowers[i]
+        else:
+            current_close, lower = self.data.close[0], self.lower_band[0]
+
         # If not in position, check for buy
         if not self.position:
-            if self.data.close[0] < self.lower_band[0]:
+            if current_close < lower:
                 # Price below the lower band => buy signal
                 self.order = self.buy()
-                self.log(f"BUY SIGNAL at {self.data.close[0]:.4f}, band={self.lower_band[0]:.4f}", color=GREEN)
+                self.log(f"BUY SIGNAL at {current_close:.4f}, band={lower:.4f}", color=GREEN)
         else:
-            # If in position, update the max price if needed
-            current_close = self.data.close[0]
+            # If in position, update the max price (set from the fill price on entry)
             if self.max_price_since_entry is None:
+                # Position not bought in this run (e.g. held on the live account): start from its price
+                self.max_price_since_entry = self.position.price
+                self._trail_stop_price = self.position.price * self._trail_mult
+            if current_close > self.max_price_since_entry:
                 self.max_price_since_entry = current_close
-            else:
-                self.max_price_since_entry = max(self.max_price_since_entry, current_close)
+                self._trail_stop_price = current_close * self._trail_mult
 
             # Check trailing stop condition:
             # If price < max_price_since_entry * (1 - trail_percent), exit
-            trail_stop_price = self.max_price_since_entry * (1 - self.p.trail_percent)
-            if current_close <= trail_stop_price:
-                self.log(f"TRAIL STOP triggered. current={current_close:.4f} < {trail_stop_price:.4f}", color=RED)
+            if current_close <= self._trail_stop_price:
+                self.log(f"TRAIL STOP triggered. current={current_close:.4f} < {self._trail_stop_price:.4f}", color=RED)
                 self.order = self.sell()
 
     def notify_order(self, order):
         """Handle order completion/cancellation."""
+        if self.signals is not None and not order.alive() and not as_expected(order, self.order_signal):
+            self.signals = None  # the broker didn't follow the replayed signals: back to the rules in next()
         if order.status in [order.Completed]:
             if order.isbuy():
                 self.entry_price = order.executed.price
                 self.max_price_since_entry = self.entry_price
-                self.log(f"BUY EXECUTED @ {self.entry_price:.4f}", color=GREEN)
+                self._trail_stop_price = self.entry_price * self._trail_mult
+                if self.p.log_enabled:
+                    self.log(f"BUY EXECUTED @ {self.entry_price:.4f}", color=GREEN)
             elif order.issell():
-                exit_price = order.executed.price
-                profit = exit_price - (self.entry_price or 0)
-                profit_pct = 0
-                if self.entry_price:
-                    profit_pct = (profit / self.entry_price) * 100
-                self.log(f"SELL EXECUTED @ {exit_price:.4f} | Profit: {profit:.4f} ({profit_pct:.2f}%)", color=RED)
+                if self.p.log_enabled:
+                    exit_price = order.executed.price
+                    profit = exit_price - (self.entry_price or 0)
+                    profit_pct = 0
+                    if self.entry_price:
+                        profit_pct = (profit / self.entry_price) * 100
+                    self.log(f"SELL EXECUTED @ {exit_price:.4f} | Profit: {profit:.4f} ({profit_pct:.2f}%)", color=RED)
 
             self.order = None
         elif order.status in [order.Canceled, order.Margin, order.Rejected]:
@@ -103,7 +158,7 @@ class BollingerTrailingStopStrategy(bt.Strategy):
 
     def notify_trade(self, trade):
         """Optional: log final trade results."""
-        if trade.isclosed:
+        if trade.isclosed and self.p.log_enabled:
             self.log(
                 f"TRADE PROFIT: Gross {trade.pnl:.2f}, Net {trade.pnlcomm:.2f}",
                 color=(GREEN if trade.pnlcomm > 0 else RED)
@@ -115,7 +170,8 @@ class BollingerTrailingStopStrategy(bt.Strategy):
 # -------------------------
 if __name__ == '__main__':
     import backtrader as bt
-    from scenario_XRPUSDT import create_cerebro_with_warmup
+    # Run from the repository root: python -m lib.strategy_08_bollinger_buy_max_profit_sell
+    from lib.scenario_XRPUSDT import create_cerebro_with_warmup
 
     # Create a Cerebro instance using your helper
     cerebro = create_cerebro_with_warmup(
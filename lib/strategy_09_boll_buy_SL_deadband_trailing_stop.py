@@ -2,15 +2,16 @@
 import backtrader as bt
 import logging
 from datetime import datetime
+import numpy as np
+from lib.indicators import OnlineBollinger
+from lib.bollinger_signals import SELL, backtest_commission, as_expected, deadband_trail_signals
+from lib.log_colors import GREEN, RED, YELLOW, color_handler
 
 # Global logging config
-logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s: %(message)s')
+logging.basicConfig(level=logging.INFO, handlers=[color_handler('%(asctime)s %(levelname)s: %(message)s')])
 
-# Optional ANSI colors
-GREEN = '\033[0;32m'
-RED = '\033[0;31m'
-YELLOW = '\033[0;33m'
-RESET = '\033[0m'
+# Per-module logger (propagates to the root handler above)
+_logger = logging.getLogger(__name__)
 
 
 class BollingerDeadbandStopTrail(bt.Strategy):
@@ -34,42 +35,91 @@ class BollingerDeadbandStopTrail(bt.Strategy):
         ('log_enabled', True),
     )
 
+    # Cached timestamp text, only rebuilt when the bar changes
+    _stamp_num = None
+    _stamp = ''
+
     def log(self, txt, color=None):
-        if not self.p.log_enabled:
+        if not self.p.log_enabled or not _logger.isEnabledFor(logging.INFO):
             return
-        dt_str = self.datas[0].datetime.datetime(0).strftime('%Y-%m-%d %H:%M:%S')
-        if color:
-            txt = f"{color}{txt}{RESET}"
-        logging.info(f"{dt_str} {txt}")
+        bar_num = self.datas[0].datetime[0]
+        if bar_num != self._stamp_num:
+            self._stamp_num = bar_num
+            self._stamp = self.datas[0].datetime.datetime(0).strftime('%Y-%m-%d %H:%M:%S')
+        _logger.info('%s %s', self._stamp, txt, extra={'color': color})
 
     def __init__(self):
-        # Compute Bollinger
-        self.sma = bt.indicators.SimpleMovingAverage(self.data.close, period=self.p.period)
-        self.std = bt.indicators.StandardDeviation(self.data.close, period=self.p.period)
-        self.lower_band = self.sma - self.std * self.p.dev_factor
-        self.upper_band = self.sma + self.std * self.p.dev_factor
+        # Compute Bollinger (O(1) per bar)
+        self.bollinger = OnlineBollinger(self.data.close, period=self.p.period,
+                                         lower_dev=self.p.dev_factor, upper_dev=self.p.dev_factor)
+        self.lower_band = self.bollinger.lower
+        self.upper_band = self.bollinger.upper
+        self.closes = self.lowers = None  # whole-feed arrays, set by nextstart() in backtests
+        self.signals = None  # orders to replay bar by bar, precomputed by nextstart() when not logging
+        self.order_signal = None
 
         # Track orders and state
         self.order = None
         self.entry_price = None
         self.max_price_since_entry = None
+        self.stop_loss_floor = None  # exit levels of the open position, set when the buy fills
+        self.deadband_upper = None
+
+        # Exit levels as multiples of the entry price / highest price, fixed for the run
+        self._stop_mult = 1 - self.p.stop_loss
+        self._deadband_mult = 1 + self.p.deadband
+        self._trail_mult = 1 - self.p.trailing_stop_percent
 
         self.log("Strategy initialized.", color=YELLOW)
 
+    def nextstart(self):
+        # In a runonce backtest the bands already cover the whole preloaded feed (their
+        # arrays are longer than the bars seen so far), so let next() index the arrays
+        # directly instead of going through the line buffers on every bar.
+        if len(self.lower_band.array) > len(self):
+            self.closes = self.data.close.array
+            self.lowers = self.lower_band.array
+
+            # With nothing to log, the entry/exit sequence of the whole backtest can be
+            # worked out in one compiled pass over the arrays; next() then only places
+            # the orders it finds
+            commission = backtest_commission(self)
+            if not (self.p.log_enabled or self.position) and commission is not None:
+                self.signals = deadband_trail_signals(
+                    np.array(self.data.open.array), np.array(self.closes), np.array(self.lowers),
+                    len(self) - 1, self.broker.getcash(), commission,
+                    self.p.stop_loss, self.p.deadband, self.p.trailing_stop_percent,
+                ).tolist()
+        self.next()
+
     def next(self):
         """Main logic each bar."""
+        if self.signals is not None:
+            i = len(self) - 1
+            signal = self.signals[i]
+            if signal:
+                self.order_signal = signal
+                if signal == SELL:
+                    self.order = self.close()
+                else:
+                    self.order = self.buy(size=(self.broker.getcash() * 0.95 / self.closes[i]))
+            return
+
         if self.order:
             # If an order is pending, do nothing
             return
 
-        current_close = self.data.close[0]
-        lb = self.lower_band[0]
+        if self.lowers is not None:
+            i = len(self) - 1
+            current_close, lb = self.closes[i], self.lowers[i]
+        else:
+            current_close, lb = self.data.close[0], self.lower_band[0]
 
         if not self.position:
             # --- BUY CONDITION ---
             # close <= lower_band => buy
             if current_close <= lb:
-                self.order = self.buy(size=(self.broker.getcash() * 0.95 / self.data.close[0]))
+                self.order = self.buy(size=(self.broker.getcash() * 0.95 / current_close))
                 self.log(f"BUY Signal: close={current_close:.4f} <= lower_band={lb:.4f}", color=GREEN)
         else:
             # Already in position -> check exit conditions
@@ -79,9 +129,9 @@ class BollingerDeadbandStopTrail(bt.Strategy):
                 # The buy order has not fully executed, skip logic
                 return
             
-            stop_loss_floor = self.entry_price * (1 - self.p.stop_loss)
-            deadband_upper  = self.entry_price * (1 + self.p.deadband)
-        
+            stop_loss_floor = self.stop_loss_floor
+            deadband_upper  = self.deadband_upper
+
             # 1) STOP LOSS
             if current_close <= stop_loss_floor:
                 self.log(f"STOP LOSS Triggered: close={current_close:.4f} <= {stop_loss_floor:.4f}", color=RED)
@@ -90,52 +140,59 @@ class BollingerDeadbandStopTrail(bt.Strategy):
                 return
 
             # 2) If price is within [stop_loss_floor, deadband_upper], do NOTHING
-            if stop_loss_floor < current_close <= deadband_upper:
-                self.log(f"In deadband zone: floor={stop_loss_floor:.4f}, deadband_upper={deadband_upper:.4f}, close={current_close:.4f}")
+            #    (it is above the floor, or the stop loss would have returned)
+            if current_close <= deadband_upper:
+                if self.p.log_enabled:
+                    self.log(f"In deadband zone: floor={stop_loss_floor:.4f}, deadband_upper={deadband_upper:.4f}, close={current_close:.4f}")
                 return
 
             # 3) Above deadband => trailing stop logic
-            if current_close > deadband_upper:
-                # Update max price
-                if self.max_price_since_entry is None:
-                    self.max_price_since_entry = current_close
-                else:
-                    self.max_price_since_entry = max(self.max_price_since_entry, current_close)
-
-                # If current falls below [max_price * (1 - trailing_stop)] => SELL
-                trail_stop_level = self.max_price_since_entry * (1 - self.p.trailing_stop_percent)
-                if current_close < trail_stop_level:
-                    self.log(
-                        f"TRAIL STOP triggered: close={current_close:.4f} < {trail_stop_level:.4f}",
-                        color=RED
-                    )
-                    self.order = self.close()
+            # Update max price (set to the entry price when the buy filled)
+            self.max_price_since_entry = max(self.max_price_since_entry, current_close)
+
+            # If current falls below [max_price * (1 - trailing_stop)] => SELL
+            trail_stop_level = self.max_price_since_entry * self._trail_mult
+            if current_close < trail_stop_level:
+                self.log(
+                    f"TRAIL STOP triggered: close={current_close:.4f} < {trail_stop_level:.4f}",
+                    color=RED
+                )
+                self.order = self.close()
 
 
     def notify_order(self, order):
         """Handle fill or cancel."""
+        if self.signals is not None and not order.alive() and not as_expected(order, self.order_signal):
+            self.signals = None  # the fill went differently than the kernel assumed; decide bar by bar again
         if order.status in [order.Completed]:
             if order.isbuy():
                 self.entry_price = order.executed.price
                 self.max_price_since_entry = self.entry_price
-                self.log(f"BUY EXECUTED @ {self.entry_price:.4f}", color=GREEN)
+                # Fixed for the life of the position, so worked out once here rather than in next()
+                self.stop_loss_floor = self.entry_price * self._stop_mult
+                self.deadband_upper = self.entry_price * self._deadband_mult
+                if self.p.log_enabled:
+                    self.log(f"BUY EXECUTED @ {self.entry_price:.4f}", color=GREEN)
             elif order.issell():
-                exit_price = order.executed.price
-                profit = exit_price - (self.entry_price or 0)
-                profit_pct = 0.0
-                if self.entry_price:
-                    profit_pct = (profit / self.entry_price) * 100
-                self.log(f"SELL EXECUTED @ {exit_price:.4f} | Profit: {profit:.4f} ({profit_pct:.2f}%)", color=RED)
+                if self.p.log_enabled:
+                    exit_price = order.executed.price
+                    profit = exit_price - (self.entry_price or 0)
+                    profit_pct = 0.0
+                    if self.entry_price:
+                        profit_pct = (profit / self.entry_price) * 100
+                    self.log(f"SELL EXECUTED @ {exit_price:.4f} | Profit: {profit:.4f} ({profit_pct:.2f}%)", color=RED)
                 # Reset state
                 self.entry_price = None
                 self.max_price_since_entry = None
+                self.stop_loss_floor = self.deadband_upper = None
             self.order = None
         elif order.status in [order.Canceled, order.Margin, order.Rejected]:
             self.log(f"Order {order.Status[order.status]}", color=YELLOW)
             self.order = None
 
     def notify_trade(self, trade):
-        if trade.isclosed:
+        # Nothing else to do with a closed trade, so don't format it unless it is logged
+        if trade.isclosed and self.p.log_enabled:
             self.log(
                 f"TRADE PROFIT: Gross={trade.pnl:.4f}, Net={trade.pnlcomm:.4f}",
                 color=(GREEN if trade.pnlcomm > 0 else RED)
@@ -146,7 +203,8 @@ class BollingerDeadbandStopTrail(bt.Strategy):
 # Example usage in Cerebro
 # ---------------------------
 if __name__ == '__main__':
-    from scenario_XRPUSDT import create_cerebro_with_warmup
+    # Run from the repository root: python -m lib.strategy_09_boll_buy_SL_deadband_trailing_stop
+    from lib.scenario_XRPUSDT import create_cerebro_with_warmup
 
     cerebro = create_cerebro_with_warmup(
         start_date=datetime(2025, 1, 1),
@@ -1,44 +1,137 @@
-import backtrader as bt
-from datetime import datetime
-
-# ANSI color codes for convenience.
-GREEN = '\033[0;32m'
-RED = '\033[0;31m'
-YELLOW = '\033[0;33m'
-RESET = '\033[0m'
-
-class market_average(bt.Strategy):
-    params = (
-        ('avg_type', 'EMA'),       # Moving average type: 'SMA', 'EMA', or 'WMA'
-        ('sma_period', 300),       # Period for the moving average indicator
-        ('buy_threshold', 0.07),   # Buy when price is at least 7% below MA
-        ('sell_threshold', 0.1),   # Sell when price is at least 10% above entry price
-        ('printlog', True),        # Enable logging if True
-        ('backtest', False),       # Backtest mode (skip live data checks)
-        ('live_lag_seconds', 65),  # Maximum allowed lag (in seconds) for a bar to be considered live
-        ('min_order', 10.0)        # Minimum cash required to place a buy order
+import itertools
+import numpy as np
+import pandas as pd
+from numba import njit
+from lib.broker_cash import buy_cash, sell_cash
+from lib.indicators import moving_average
+from lib.strategy_01_market_average import market_average
+
+"""
+Backtests of `market_average` (lib/strategy_01_market_average.py) without
+Cerebro:
+
+- flat: buy (cash / close) * 0.95 when close < MA * (1 - buy_threshold) and
+  there is at least `min_order` cash
+- long: sell everything when close > entry * (1 + sell_threshold)
+
+`run_market_average` backtests one parameter set with one compiled scan over
+the close prices and their moving average (market orders fill at the next
+bar's open, paying `commission` on the traded value, and a buy the cash can't
+cover is refused, as Backtrader's default broker does); `sweep` does it for a
+whole grid, computing each moving average once. The strategy itself is still
+what runs the logged/plotted backtest of the parameters they pick.
+"""
+
+
+@njit(cache=True)
+def _market_average_value(open_, close, ma, buy_threshold, sell_threshold, min_order, cash, commission):
+    """Final portfolio value of the rules over the bars (NaN moving average = warming up)."""
+    n_bars = close.size
+    buy_factor = 1 - buy_threshold
+    sell_factor = 1 + sell_threshold
+    size = 0.0        # position size, 0 = flat
+    entry = 0.0       # position price
+    pending = 0       # +1 buy / -1 sell market order waiting for the next open
+    order_size = 0.0
+    for i in range(n_bars):
+        # Orders from the previous bar fill at this bar's open, before the rules run
+        if pending == 1:
+            if (buy_cash(cash, order_size, close[i - 1], commission) >= 0.0
+                    and buy_cash(cash, order_size, open_[i], commission) >= 0.0):
+                cash = buy_cash(cash, order_size, open_[i], commission)
+                size = order_size
+                entry = open_[i]
+        elif pending == -1:
+            cash = sell_cash(cash, size, entry, open_[i], commission)
+            size = 0.0
+        pending = 0
+
+        if np.isnan(ma[i]):
+            continue
+        c = close[i]
+        if size == 0.0:
+            if cash >= min_order and c < ma[i] * buy_factor:
+                order_size = (cash / c) * 0.95
+                pending = 1
+        elif c > entry * sell_factor:
+            pending = -1
+
+    if n_bars == 0:
+        return cash
+    return cash + size * close[n_bars - 1]
+
+
+def run_market_average(
+    data: pd.DataFrame,
+    avg_type: str = 'EMA',
+    sma_period: int = 300,
+    buy_threshold: float = 0.07,
+    sell_threshold: float = 0.1,
+    min_order: float = 10.0,
+    cash: float = 100.0,
+    commission: float = 0.001
+) -> float:
+    """
+    Backtest one parameter set on `data` without Cerebro.
+
+    :param data: OHLCV DataFrame of the backtest window (as from `load_price_data`)
+    :param cash: Starting cash
+    :param commission: Broker commission rate
+    :return: Final portfolio value
+    """
+    close = data['close'].astype(np.float64)
+    return _market_average_value(
+        data['open'].to_numpy(dtype=np.float64), close.to_numpy(),
+        moving_average(close, avg_type, sma_period),
+        buy_threshold, sell_threshold, min_order, cash, commission,
     )
 
-    def __init__(self):
-        self.
 
+def sweep(
+    data: pd.DataFrame,
+    avg_types=('EMA',),
+    sma_periods=(300,),
+    buy_thresholds=(0.07,),
+    sell_thresholds=(0.1,),
+    min_order: float = 10.0,
+    cash: float = 100.0,
+    commission: float = 0.001
+) -> pd.DataFrame:
+    """
+    Backtest every combination of the given parameter lists.
+
+    :param data: OHLCV DataFrame of the backtest window (as from `load_price_data`)
+    :param min_order: Minimum cash to place a buy
+    :param cash: Starting cash
+    :param commission: Broker commission rate
+    :return: One row per combination with its parameters and `final_value`, best first
+    """
+    open_ = data['open'].to_numpy(dtype=np.float64)
+    close = data['close'].astype(np.float64)
+    rows = []
+    for avg_type, sma_period in itertools.product(avg_types, sma_periods):
+        ma = moving_average(close, avg_type, sma_period)
+        for buy_threshold, sell_threshold in itertools.product(buy_thresholds, sell_thresholds):
+            final_value = _market_average_value(open_, close.to_numpy(), ma, buy_threshold, sell_threshold,
+                                                min_order, cash, commission)
+            rows.append((avg_type, sma_period, buy_threshold, sell_threshold, final_value))
 
-    def next(self):
-        pass
+    results = pd.DataFrame(rows, columns=['avg_type', 'sma_period', 'buy_threshold', 'sell_threshold', 'final_value'])
+    return results.sort_values('final_value', ascending=False, kind='stable', ignore_index=True)
 
 
 if __name__ == "__main__":
 
-    from scenario_XRPUSD_2024_march_June import return_trading_scenario
-    cerebro = return_trading_scenario()
-    cerebro.addstrategy(market_average,
-                        avg_type='EMA',
-                        sma_period=30,
-                        buy_threshold=0.03,
-                        sell_threshold=0.07,
-                        min_order=100,
-                        printlog=True)
-    
+    # Run from the repository root: python -m lib.strategy_JLA
+    from lib.scenario_XRPUSDT import create_cerebro_with_warmup, load_price_data
+
+    params = dict(avg_type='EMA', sma_period=30, buy_threshold=0.03, sell_threshold=0.07, min_order=100)
+    print(f"Compiled backtest: {run_market_average(load_price_data(), **params):.2f}")
+
+    cerebro = create_cerebro_with_warmup()
+    cerebro.addstrategy(market_average, printlog=True, **params)
+
     cerebro.broker.setcommission(commission=0.001)
     cerebro.run()
-    cerebro.plot()
\ No newline at end of file
+    print(f"Cerebro backtest: {cerebro.broker.getvalue():.2f}")
+    cerebro.plot()
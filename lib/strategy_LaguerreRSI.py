@@ -1,5 +1,6 @@
 import backtrader as bt
 from datetime import datetime
+from lib.indicators import NumbaLaguerreRSI
 
 """
 LaguerreRSIStrategy: A Trading Strategy Based on LaguerreRSI
@@ -27,7 +28,9 @@ Optimization:
 
 Usage:
 -----------
-- Historical data is loaded from a CSV file.
+- Run it from the repository root as a module, `python -m lib.strategy_LaguerreRSI`
+  (it imports `lib.indicators`, so `python lib/strategy_LaguerreRSI.py` can't find it).
+- Historical data is loaded from a CSV file, relative to the directory it is run from.
 - The final portfolio value is used to determine the best parameter set.
 """
 
@@ -40,28 +43,34 @@ class LaguerreRSIStrategy(bt.Strategy):
     )
     
     def __init__(self):
-        # Create the LaguerreRSI indicator on the close price.
-        self.laguerre_rsi = bt.indicators.LaguerreRSI(self.data.close, gamma=self.p.gamma)
+        # Create the LaguerreRSI indicator on the close price (compiled in backtests).
+        self.laguerre_rsi = NumbaLaguerreRSI(self.data.close, gamma=self.p.gamma)
         self.order = None  # Track pending orders
 
     def next(self):
         if self.order:
             return
-        
+
+        # Read the indicator and the position once per bar (each goes through Backtrader's
+        # line/broker machinery); the close and the cash are only needed to place an order
+        lrsi = self.laguerre_rsi[0]
+        position = self.position
+
         # If not in a position, check for a buy signal.
-        if not self.position:
-            if self.laguerre_rsi[0] < self.p.rsi_threshold_buy:
+        if not position:
+            if lrsi < self.p.rsi_threshold_buy:
+                close = self.data.close[0]
                 cash = self.broker.getcash()
-                size = (cash / self.data.close[0]) * 0.95
+                size = (cash / close) * 0.95
                 self.order = self.buy(size=size)
                 if self.p.printlog:
-                    self.log(f"BUY: Close {self.data.close[0]:.2f}, LaguerreRSI {self.laguerre_rsi[0]:.2f}")
+                    self.log(f"BUY: Close {close:.2f}, LaguerreRSI {lrsi:.2f}")
         else:
             # If in a position, check for a sell signal.
-            if self.laguerre_rsi[0] > self.p.rsi_threshold_sell:
-                self.order = self.sell(size=self.position.size)
+            if lrsi > self.p.rsi_threshold_sell:
+                self.order = self.sell(size=position.size)
                 if self.p.printlog:
-                    self.log(f"SELL: Close {self.data.close[0]:.2f}, LaguerreRSI {self.laguerre_rsi[0]:.2f}")
+                    self.log(f"SELL: Close {self.data.close[0]:.2f}, LaguerreRSI {lrsi:.2f}")
 
     def notify_order(self, order):
         if order.status in [order.Completed]:
@@ -72,6 +81,7 @@ class LaguerreRSIStrategy(bt.Strategy):
         print(f"{dt.isoformat()} {txt}")
 
 if __name__ == '__main__':
+    # Run from the repository root: python -m lib.strategy_LaguerreRSI
     # Get a Cerebro instance and configure it via your scenario helper.
     # For example, you might have a function return_trading_scenario() that sets up Cerebro with data, cash, and commission.
     # Here, we'll create a simple Cerebro instance manually for illustration.
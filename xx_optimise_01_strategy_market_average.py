@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+import os
+from datetime import datetime
+from lib.scenario_XRPUSDT import create_cerebro_with_warmup, load_price_data
+from lib.strategy_01_market_average import market_average
+from lib.strategy_JLA import sweep
+
+if __name__ == '__main__':
+    # Define backtest window
+    start_date = datetime(2025, 1, 1)
+    end_date   = datetime(2025, 3, 1)
+
+    # 1) Optimization: each combination is one compiled scan over the preloaded
+    # prices (the moving averages are computed once per type/period), not a Cerebro run
+    optimized_runs = sweep(
+        load_price_data(start_date=start_date, end_date=end_date),
+        avg_types=['EMA', 'SMA'],
+        sma_periods=[30, 100, 300, 600],
+        buy_thresholds=[0.01, 0.03, 0.05, 0.07],
+        sell_thresholds=[0.02, 0.05, 0.1],
+        min_order=10.0,
+        commission=0.001,
+    )
+
+    # 2) The sweep returns the runs sorted by final portfolio value, best first
+    print(optimized_runs.head(10).to_string(index=False))
+
+    best = optimized_runs.iloc[0]
+    best_portfolio_value = float(best['final_value'])
+    best_params = {
+        'avg_type': str(best['avg_type']),
+        'sma_period': int(best['sma_period']),
+        'buy_threshold': float(best['buy_threshold']),
+        'sell_threshold': float(best['sell_threshold']),
+        'min_order': 10.0,
+        # We'll enable logging on the final run
+        'printlog': True
+    }
+
+    # 3) Final Run with Best Params + Logging
+    cerebro_final = create_cerebro_with_warmup(
+        start_date=start_date,
+        end_date=end_date
+    )
+
+    cerebro_final.addstrategy(market_average, **best_params)
+    cerebro_final.broker.setcommission(commission=0.001)
+
+    print("\nRunning final backtest with best parameters and full logging...\n")
+    result = cerebro_final.run()
+
+    print(f"\nOptimization complete. Number of combos tested: {len(optimized_runs)}")
+    print(f"Best Final Portfolio Value: {best_portfolio_value:.2f}")
+    print(f"Best Params: {best_params}")
+
+    # Optional: plot final (run with PLOT=0 to skip the chart)
+    if os.environ.get('PLOT', '1') != '0':
+        cerebro_final.plot()
@@ -1,54 +1,36 @@
 #!/usr/bin/env python3
 
+import os
 from datetime import datetime
-from lib.scenario_XRPUSDT import create_cerebro_with_warmup
+from lib.scenario_XRPUSDT import create_cerebro_with_warmup, load_price_data
 from lib.strategy_08_bollinger_buy_max_profit_sell import BollingerTrailingStopStrategy
+from lib.optimise_08_bollinger_trailing_stop import sweep
 
 # Define backtest window
 start_date = datetime(2025, 1, 1)
 end_date   = datetime(2025, 3, 1)
 
-# 1) Create Cerebro for Optimization
-cerebro_opt = create_cerebro_with_warmup(
-    start_date=start_date,
-    end_date=end_date
-)
-
-# Provide parameter grids for optstrategy
-cerebro_opt.optstrategy(
-    BollingerTrailingStopStrategy,
-    period=[20, 30, 50],     # Bollinger period
-    dev_factor=[0.1, 0.5, 1.5, 2.0, 2.5, 3],  # standard deviation multipliers
-    trail_percent=[0.015, 0.05, 0.3 ],
-    log_enabled=[False]          # Turn off logs for speed
-)
-
-# Run all combinations with optreturn=False so we get real Strategy objects
-optimized_runs = cerebro_opt.run(
-    optreturn=False,
-    preload=True,  # pre-load data
-    runonce=True   # batch indicator calculation
+# 1) Optimization: the strategy's rules are replayed by a parallel Numba kernel on the
+# preloaded prices for every combination at once, instead of one Cerebro run each
+optimized_runs = sweep(
+    load_price_data(start_date=start_date, end_date=end_date),
+    periods=[20, 30, 50],     # Bollinger period
+    dev_factors=[0.1, 0.5, 1.5, 2.0, 2.5, 3],  # standard deviation multipliers
+    trail_percents=[0.015, 0.05, 0.3 ],
 )
 
-# 2) Find the best run by final portfolio value
-best_portfolio_value = float('-inf')
-best_params = None
+# 2) The sweep returns the runs sorted by final portfolio value, best first
+print(optimized_runs.head(10).to_string(index=False))
 
-for run in optimized_runs:
-    # Each "run" is typically a list with one strategy instance
-    strat_instance = run[0]
-    final_value = strat_instance.broker.getvalue()
-    if final_value > best_portfolio_value:
-        best_portfolio_value = final_value
-        p = strat_instance.params
-        # Store the best parameters
-        best_params = {
-            'period': p.period,
-            'dev_factor': p.dev_factor,
-            'trail_percent': p.trail_percent,
-            # We'll enable logging on the final run
-            'log_enabled': True
-        }
+best = optimized_runs.iloc[0]
+best_portfolio_value = float(best['final_value'])
+best_params = {
+    'period': int(best['period']),
+    'dev_factor': float(best['dev_factor']),
+    'trail_percent': float(best['trail_percent']),
+    # We'll enable logging on the final run
+    'log_enabled': True
+}
 
 # 3) Final Run with Best Params + Logging
 cerebro_final = create_cerebro_with_warmup(
@@ -65,5 +47,6 @@ print(f"\nOptimization complete. Number of combos tested: {len(optimized_runs)}"
 print(f"Best Final Portfolio Value: {best_portfolio_value:.2f}")
 print(f"Best Params: {best_params}")
 
-# Optional: plot final
-cerebro_final.plot()
+# Optional: plot final (run with PLOT=0 to skip the chart)
+if os.environ.get('PLOT', '1') != '0':
+    cerebro_final.plot()